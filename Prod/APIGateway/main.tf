@@ -93,6 +93,44 @@ resource "aws_apigatewayv2_route" "admin_links" {
 
 }
 
+############################################
+# Route: POST /admin/upload  (JWT protected)
+############################################
+# Multipart upload of originals: start / presigned part URLs / complete / abort
+resource "aws_apigatewayv2_route" "admin_upload" {
+  api_id    = aws_apigatewayv2_api.signer.id
+  route_key = "POST /admin/upload"
+  target    = "integrations/${aws_apigatewayv2_integration.signer_lambda.id}"
+
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_jwt.id
+
+}
+
+############################################
+# Route: GET|POST /admin/coverage  (JWT protected)
+############################################
+# GET reports missing/stale/orphaned thumbs for a folder; POST {"enqueue": true} also queues the gaps
+resource "aws_apigatewayv2_route" "admin_coverage_get" {
+  api_id    = aws_apigatewayv2_api.signer.id
+  route_key = "GET /admin/coverage"
+  target    = "integrations/${aws_apigatewayv2_integration.signer_lambda.id}"
+
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_jwt.id
+
+}
+
+resource "aws_apigatewayv2_route" "admin_coverage_post" {
+  api_id    = aws_apigatewayv2_api.signer.id
+  route_key = "POST /admin/coverage"
+  target    = "integrations/${aws_apigatewayv2_integration.signer_lambda.id}"
+
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_jwt.id
+
+}
+
 ############################################
 # Route: GET /open 
 ############################################
@@ -178,3 +216,30 @@ resource "aws_lambda_permission" "allow_apigw_invoke_links_list" {
 
   source_arn = "${aws_apigatewayv2_api.signer.execution_arn}/${aws_apigatewayv2_stage.prod.name}/GET/admin/links"
 }
+
+resource "aws_lambda_permission" "allow_apigw_invoke_admin_upload" {
+  statement_id  = "AllowExecutionFromAPIGatewayV2AdminUpload"
+  action        = "lambda:InvokeFunction"
+  function_name = var.lambda_cookie_generator_name
+  principal     = "apigateway.amazonaws.com"
+
+  source_arn = "${aws_apigatewayv2_api.signer.execution_arn}/${aws_apigatewayv2_stage.prod.name}/POST/admin/upload"
+}
+
+resource "aws_lambda_permission" "allow_apigw_invoke_admin_coverage_get" {
+  statement_id  = "AllowExecutionFromAPIGatewayV2AdminCoverageGet"
+  action        = "lambda:InvokeFunction"
+  function_name = var.lambda_cookie_generator_name
+  principal     = "apigateway.amazonaws.com"
+
+  source_arn = "${aws_apigatewayv2_api.signer.execution_arn}/${aws_apigatewayv2_stage.prod.name}/GET/admin/coverage"
+}
+
+resource "aws_lambda_permission" "allow_apigw_invoke_admin_coverage_post" {
+  statement_id  = "AllowExecutionFromAPIGatewayV2AdminCoveragePost"
+  action        = "lambda:InvokeFunction"
+  function_name = var.lambda_cookie_generator_name
+  principal     = "apigateway.amazonaws.com"
+
+  source_arn = "${aws_apigatewayv2_api.signer.execution_arn}/${aws_apigatewayv2_stage.prod.name}/POST/admin/coverage"
+}
@@ -83,11 +83,11 @@ resource "aws_cloudfront_cache_policy" "ttl_5_minutes" {
     # If your /list endpoint uses query strings (e.g. /list?folder=test2/),
     # you MUST include that in the cache key, otherwise all folders share one cache.
     #
-    # Recommended: whitelist only "folder"
+    # Recommended: whitelist only "folder" (+ "sort": key order vs EXIF capture order)
     query_strings_config {
       query_string_behavior = "whitelist"
       query_strings {
-        items = ["folder"]
+        items = ["folder", "sort"]
       }
     }
 
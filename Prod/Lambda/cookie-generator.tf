@@ -48,12 +48,34 @@ resource "aws_lambda_function" "cookie_generator" {
       GALLERY_BUCKET         = var.gallery_bucket_name
       GALLERY_INDEX_PATH     = var.gallery_index_path
       LIST_PATH              = "/list"
+      LIST_PARALLEL_SHARDS   = "8"                          # concurrent key ranges for folders > 1000 objects
+      LIST_SHARD_PROBES      = "32"                         # MaxKeys=1 probes that locate shard split keys
+      MAX_BODY_BYTES         = "262144"                     # larger request bodies -> 413 before parsing
+
+      # Admin multipart upload (POST /admin/upload)
+      UPLOAD_PART_MIB        = "16"
+      UPLOAD_MAX_PARTS       = "2000"
+      UPLOAD_PRESIGN_BATCH   = "100"
+      UPLOAD_URL_TTL_SECONDS = "3600"
+
+      # Thumbnail coverage report (/admin/coverage); keep in sync with thumb-generator.tf
+      THUMB_FILE_PREFIX      = "thumb-of-"
+      THUMB_DECIDER_MIN_MIB  = "1"
+      THUMB_QUEUE_URL        = var.thumb_queue_url
 
       DDB_TABLE_NAME              = var.dynamodb_table_name
       LIST_CACHE_TTL_SECONDS      = var.list_cache_ttl_seconds
       TOKEN_TTL_BUFFER_SECONDS    = var.token_ttl_buffer_seconds
       INCLUDE_TOKEN_IN_REDIRECT   = var.include_token_in_redirect
 
+      # Signing key is preloaded at init and re-read from the secret on this interval (rotation without redeploy)
+      SIGNER_REFRESH_SECONDS      = "300"
+
+      # boto3 client tuning (aws_clients.py); keep LAMBDA_TIMEOUT_SECONDS equal to timeout below
+      LAMBDA_TIMEOUT_SECONDS      = "10"
+      BOTO_MAX_POOL_CONNECTIONS   = "32"
+      BOTO_RETRY_MODE             = "adaptive"
+
        
     }
   }
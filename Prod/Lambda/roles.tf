@@ -65,6 +65,64 @@ resource "aws_iam_role_policy_attachment" "lambda_list_bucket" {
   policy_arn = aws_iam_policy.lambda_list_bucket.arn
 }
 
+# Read thumbs/<folder>/_index.json (image metadata returned by /list)
+resource "aws_iam_role_policy" "lambda_read_folder_index" {
+  name = "lambda-read-folder-index"
+  role = aws_iam_role.lambda_exec.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Sid      = "ReadFolderIndex"
+        Effect   = "Allow"
+        Action   = ["s3:GetObject"]
+        Resource = ["arn:aws:s3:::${var.gallery_bucket_name}/thumbs/*"]
+      }
+    ]
+  })
+}
+
+# Multipart upload of originals from the admin console (presigned part URLs carry this role's identity)
+resource "aws_iam_role_policy" "lambda_upload_originals" {
+  name = "lambda-upload-originals"
+  role = aws_iam_role.lambda_exec.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Sid    = "MultipartUploadGallery"
+        Effect = "Allow"
+        Action = [
+          "s3:PutObject",
+          "s3:AbortMultipartUpload",
+          "s3:ListMultipartUploadParts"
+        ]
+        Resource = ["arn:aws:s3:::${var.gallery_bucket_name}/gallery/*"]
+      }
+    ]
+  })
+}
+
+# Coverage gap filling: enqueue missing/stale thumbs
+resource "aws_iam_role_policy" "lambda_enqueue_thumbs" {
+  name = "lambda-enqueue-thumbs"
+  role = aws_iam_role.lambda_exec.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Sid      = "SendThumbJobs"
+        Effect   = "Allow"
+        Action   = ["sqs:SendMessage"]
+        Resource = var.thumb_queue_arn
+      }
+    ]
+  })
+}
+
 # DynamoDB
 data "aws_iam_policy_document" "lambda_dynamodb" {
   statement {
@@ -138,18 +196,36 @@ resource "aws_iam_role_policy" "lambda_thumb_s3_inline" {
       # This covers:
       # - thumbs/<album>/thumb-of-*.jpg
       # - thumbs/<album>/   (your folder marker object ending with '/')
+      # - thumbs/<album>/_index.json (read-modify-write of image metadata)
+      # DeleteObject: thumbs of deleted originals (ObjectRemoved + sweep_orphans)
       {
         Sid    = "WriteThumbs"
         Effect = "Allow"
         Action = [
           "s3:PutObject",
-          "s3:HeadObject"
+          "s3:GetObject",
+          "s3:HeadObject",
+          "s3:DeleteObject"
         ]
         Resource = [
           "arn:aws:s3:::${var.gallery_bucket_name}/thumbs/*"
         ]
       },
 
+      # Failure ledger (thumb-failures/<original key>.json) for the retry driver
+      {
+        Sid    = "FailureLedger"
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+          "s3:DeleteObject"
+        ]
+        Resource = [
+          "arn:aws:s3:::${var.gallery_bucket_name}/thumb-failures/*"
+        ]
+      },
+
       # Optional: ListBucket (only if you ever list; safe to keep)
       {
         Sid    = "ListBucketLimited"
@@ -158,7 +234,7 @@ resource "aws_iam_role_policy" "lambda_thumb_s3_inline" {
         Resource = "arn:aws:s3:::${var.gallery_bucket_name}"
         Condition = {
           StringLike = {
-            "s3:prefix" = ["gallery/*", "thumbs/*"]
+            "s3:prefix" = ["gallery/*", "thumbs/*", "thumb-failures/*"]
           }
         }
       }
@@ -166,6 +242,29 @@ resource "aws_iam_role_policy" "lambda_thumb_s3_inline" {
   })
 }
 
+# SQS (S3 events buffered in the thumb queue)
+resource "aws_iam_role_policy" "lambda_thumb_sqs" {
+  name = "lambda-thumb-sqs"
+  role = aws_iam_role.lambda_thumb.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Sid    = "ConsumeThumbQueue"
+        Effect = "Allow"
+        Action = [
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:ChangeMessageVisibility",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = var.thumb_queue_arn
+      }
+    ]
+  })
+}
+
 resource "aws_iam_role_policy_attachment" "lambda_thumb_s3" {
   role       = aws_iam_role.lambda_thumb.name
   policy_arn = aws_iam_policy.lambda_list_bucket.arn
@@ -27,6 +27,25 @@ resource "aws_lambda_function" "thumb_generator" {
     # Thumb output size (I recommend 640 for your grid, but you can keep 480)
     THUMB_MAX_SIZE = "640"
     JPEG_QUALITY   = "75"
+    # Byte budget per JPEG thumb ("0" = fixed JPEG_QUALITY); quality is searched within MIN..MAX
+    JPEG_TARGET_BYTES        = "0"
+    JPEG_TARGET_QUALITY_MIN  = "45"
+    JPEG_TARGET_QUALITY_MAX  = "90"
+    JPEG_TARGET_MAX_ATTEMPTS = "5"
+
+    # Extra cropped rendition for fixed-ratio grids: thumbs/<album>/square-of-<file>.jpg
+    CROP_THUMB_ENABLED = "false"
+    CROP_THUMB_RATIO   = "1:1"       # width:height
+    CROP_THUMB_SIZE    = "320"
+    CROP_THUMB_MODE    = "saliency"  # saliency | center
+
+    # Batch scheduling: cheapest records first, start one only while RSS + estimate <= fraction of memory_size
+    SCHED_ENABLED                 = "true"
+    SCHED_MEM_FRACTION            = "0.8"
+    SCHED_OVERHEAD_MB             = "24"
+    SCHED_PROBE_BYTES             = "131072"  # ranged GET of each image header for its pixel dimensions
+    SCHED_UNKNOWN_PIXELS_PER_BYTE = "10"      # pixel guess per file byte when the header probe fails
+
     CACHE_CONTROL  = "public, max-age=31536000, immutable"
 
     CREATE_THUMB_FOLDER_MARKER = "false"
@@ -35,11 +54,34 @@ resource "aws_lambda_function" "thumb_generator" {
     THUMB_DECIDER_MODE            = "bytes"     # bytes | pixels
     THUMB_DECIDER_MIN_MIB         = "1"         # create thumb only if original >= 1 MiB
     THUMB_DECIDER_MIN_MAXDIM_PX   = "0"         # unused in bytes mode
+
+    # Per-album metadata (dims, colour, blurhash) in thumbs/<album>/_index.json, read by /list
+    FOLDER_INDEX_ENABLED = "true"
+    FOLDER_INDEX_NAME    = "_index.json"
+    # Conditional-write conflicts retry with jittered exponential backoff; after that the
+    # entries are parked in thumb-failures/_index/ and merged by the retry driver
+    FOLDER_INDEX_MAX_RETRIES     = "6"
+    FOLDER_INDEX_BACKOFF_MS      = "50"
+    FOLDER_INDEX_BACKOFF_MAX_MS  = "1000"
+
+    # Failed thumbs are recorded here and retried by the scheduled driver
+    # with escalating strategies: default -> low_draft -> tmp -> placeholder
+    FAILURE_LEDGER_ENABLED = "true"
+    FAILURE_LEDGER_PREFIX  = "thumb-failures/"
+    RETRY_MAX_ATTEMPTS     = "6"
+    RETRY_MAX_PER_RUN      = "50"
+    SQS_MAX_RECEIVE_COUNT  = tostring(var.thumb_queue_max_receive_count)  # deferred messages go to the ledger before the DLQ
+
+    # boto3 client tuning (aws_clients.py); keep LAMBDA_TIMEOUT_SECONDS equal to timeout below
+    LAMBDA_TIMEOUT_SECONDS    = tostring(var.thumb_timeout_seconds)
+    BOTO_MAX_POOL_CONNECTIONS = "32"
+    BOTO_RETRY_MODE           = "adaptive"
        
     }
   }
 
-  timeout     = 10
+  # SQS batches hold several images per invocation
+  timeout     = var.thumb_timeout_seconds
   memory_size = 512
 }
 
@@ -55,8 +97,58 @@ resource "aws_lambda_layer_version" "pillow" {
 }
 
 
+############################################
+# SQS -> Thumb Generator
+############################################
+resource "aws_lambda_event_source_mapping" "thumb_queue" {
+  event_source_arn = var.thumb_queue_arn
+  function_name    = aws_lambda_function.thumb_generator.arn
+
+  batch_size                         = var.thumb_queue_batch_size
+  maximum_batching_window_in_seconds = var.thumb_queue_batching_window_seconds
+
+  # Lambda returns batchItemFailures only for deferred messages and failures it could not
+  # record in the failure ledger (recorded ones are retried by the scheduled driver)
+  function_response_types = ["ReportBatchItemFailures"]
+
+  # Backpressure: a 1,000-file upload drains at this many concurrent invocations
+  scaling_config {
+    maximum_concurrency = var.thumb_queue_max_concurrency
+  }
+}
+
+
+############################################
+# Scheduled retry driver (failure ledger)
+############################################
+resource "aws_cloudwatch_event_rule" "thumb_retry" {
+  name                = "thumb-retry-failures"
+  description         = "Reprocess originals recorded in thumb-failures/"
+  schedule_expression = var.thumb_retry_schedule
+}
+
+resource "aws_cloudwatch_event_target" "thumb_retry" {
+  rule = aws_cloudwatch_event_rule.thumb_retry.name
+  arn  = aws_lambda_function.thumb_generator.arn
+
+  input = jsonencode({
+    action = "retry_failures"
+    bucket = var.gallery_bucket_name
+  })
+}
+
+resource "aws_lambda_permission" "allow_events_invoke_thumb" {
+  statement_id  = "AllowExecutionFromEventBridgeRetry"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.thumb_generator.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.thumb_retry.arn
+}
+
+
 ############################################
 # Premission for S3 to invoke lambda
+# (kept so direct S3 -> Lambda notifications still work if re-enabled)
 ############################################
 
 resource "aws_lambda_permission" "allow_s3_invoke_thumb" {
@@ -146,4 +146,58 @@ variable "gallery_prefix" {
     type = string
     default = "gallery/"
   
-}
\ No newline at end of file
+}
+
+variable "thumb_queue_arn" {
+    type = string
+    description = "Thumb events SQS queue ARN"
+
+}
+
+variable "thumb_queue_url" {
+    type = string
+    description = "Thumb events SQS queue URL (admin coverage gap filling)"
+
+}
+
+variable "thumb_queue_max_receive_count" {
+    type = number
+    description = "Thumb queue deliveries before the DLQ (deferred messages move to the failure ledger before that)"
+    default = 5
+
+}
+
+variable "thumb_timeout_seconds" {
+    type = number
+    description = "Thumb generator timeout (keep SQS visibility timeout >= 6x this)"
+    default = 60
+
+}
+
+variable "thumb_queue_batch_size" {
+    type = number
+    description = "Max S3 events per thumb Lambda invocation"
+    default = 10
+
+}
+
+variable "thumb_queue_batching_window_seconds" {
+    type = number
+    description = "How long SQS may wait to fill a batch"
+    default = 5
+
+}
+
+variable "thumb_queue_max_concurrency" {
+    type = number
+    description = "Max concurrent thumb invocations from the queue (min 2)"
+    default = 5
+
+}
+
+variable "thumb_retry_schedule" {
+    type = string
+    description = "How often the thumb retry driver drains the failure ledger"
+    default = "rate(30 minutes)"
+
+}
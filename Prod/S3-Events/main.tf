@@ -1,68 +1,25 @@
-
 ############################################
 # Gallery Bucket EVENT
 ############################################
+# Media events go to the thumb SQS queue (buffered, batched, retried with a DLQ)
+# instead of invoking the thumb Lambda directly for every object.
+# ObjectRemoved lets the thumb Lambda delete the thumbs/index entry of deleted originals.
+locals {
+  thumb_media_suffixes = [".jpg", ".jpeg", ".png", ".webp", ".gif", ".mp4", ".mov", ".webm", ".m4v"]
+}
+
 resource "aws_s3_bucket_notification" "thumb_event_media" {
   bucket = var.gallery_bucket_name
 
-  # Images
-  lambda_function { 
-   lambda_function_arn = var.lambda_thumb_arn
-   events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-   filter_prefix = "gallery/" 
-   filter_suffix = ".jpg" 
-  }
-
-  lambda_function { 
-   lambda_function_arn = var.lambda_thumb_arn 
-   events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-   filter_prefix = "gallery/" 
-   filter_suffix = ".jpeg" 
-  }
-  lambda_function { 
-    lambda_function_arn = var.lambda_thumb_arn 
-     events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-     filter_prefix = "gallery/" 
-    filter_suffix = ".png" 
-  }
-  lambda_function { 
-    lambda_function_arn = var.lambda_thumb_arn 
-    events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-    filter_prefix = "gallery/" 
-    filter_suffix = ".webp" 
-  }
-  lambda_function { 
-    lambda_function_arn = var.lambda_thumb_arn 
-    events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-    filter_prefix = "gallery/" 
-    filter_suffix = ".gif"  
-  }
-
-  # Videos
-  lambda_function { 
-    lambda_function_arn = var.lambda_thumb_arn 
-    events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-    filter_prefix = "gallery/" 
-    filter_suffix = ".mp4"  
-  }
-  lambda_function { 
-    lambda_function_arn = var.lambda_thumb_arn 
-    events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-    filter_prefix = "gallery/" 
-    filter_suffix = ".mov"  
-  }
-  lambda_function { 
-    lambda_function_arn = var.lambda_thumb_arn 
-    events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-    filter_prefix = "gallery/" 
-    filter_suffix = ".webm" 
-  }
-  lambda_function { 
-    lambda_function_arn = var.lambda_thumb_arn 
-    events = ["s3:ObjectCreated:Put","s3:ObjectCreated:CompleteMultipartUpload"] 
-    filter_prefix = "gallery/" 
-    filter_suffix = ".m4v"  
+  dynamic "queue" {
+    for_each = local.thumb_media_suffixes
+    content {
+      queue_arn     = var.thumb_queue_arn
+      events        = ["s3:ObjectCreated:Put", "s3:ObjectCreated:CompleteMultipartUpload", "s3:ObjectRemoved:*"]
+      filter_prefix = "gallery/"
+      filter_suffix = queue.value
     }
+  }
 }
 
 
@@ -1,6 +1,6 @@
-variable "lambda_thumb_arn" {
+variable "thumb_queue_arn" {
   type = string
-  description = "Lambda thumb generator ARN"
+  description = "Thumb events SQS queue ARN"
   
 }
 
@@ -8,4 +8,4 @@ variable "gallery_bucket_name" {
     type = string
     description = "Gallery bucket name"
   
-}
\ No newline at end of file
+}
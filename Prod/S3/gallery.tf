@@ -44,6 +44,17 @@ module "gallery-bucket" {
   ]
 
 
+  # Admin console PUTs multipart parts straight to the bucket (presigned URLs); ETag is needed to complete
+  cors_rule = var.admin_origin == "" ? [] : [
+    {
+      allowed_methods = ["PUT"]
+      allowed_origins = [var.admin_origin]
+      allowed_headers = ["*"]
+      expose_headers  = ["ETag"]
+      max_age_seconds = 3600
+    }
+  ]
+
   force_destroy = false
   control_object_ownership = true
   object_ownership         = "BucketOwnerEnforced"
@@ -72,7 +72,8 @@
   }
 
   async function loadList(folder, token) {
-    const url = `/list?folder=${encodeURIComponent(folder)}&t=${encodeURIComponent(token)}`;
+    // sort=captured: images in EXIF capture order (from the folder index, no extra downloads)
+    const url = `/list?folder=${encodeURIComponent(folder)}&sort=captured&t=${encodeURIComponent(token)}`;
     const resp = await fetch(url, { cache: "no-store" });
 
     if (resp.status === 401 || resp.status === 403) { goError(403, "link_expired"); return null; }
@@ -81,9 +82,116 @@
     return resp.json();
   }
 
+  // =========================
+  // Placeholders from /list "meta" (written by the thumb Lambda)
+  // meta[key] = { w, h, orientation, color, blurhash, taken?, camera?, lens?, gps?, exif_orientation? }
+  // =========================
+  const B83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~";
+
+  function b83(str) {
+    let v = 0;
+    for (const c of str) v = v * 83 + B83.indexOf(c);
+    return v;
+  }
+
+  function srgbToLinear(v) {
+    const x = v / 255;
+    return x <= 0.04045 ? x / 12.92 : Math.pow((x + 0.055) / 1.055, 2.4);
+  }
+
+  function linearToSrgb(v) {
+    const x = Math.max(0, Math.min(1, v));
+    return x <= 0.0031308
+      ? Math.round(x * 12.92 * 255)
+      : Math.round((1.055 * Math.pow(x, 1 / 2.4) - 0.055) * 255);
+  }
+
+  function signPow(v, e) { return Math.sign(v) * Math.pow(Math.abs(v), e); }
+
+  // Decode a blurhash into a tiny data: URL (32px wide is plenty, CSS scales it)
+  function blurhashToDataUrl(hash, w, h) {
+    if (!hash || hash.length < 6) return null;
+    const size = b83(hash[0]);
+    const nx = (size % 9) + 1;
+    const ny = Math.floor(size / 9) + 1;
+    if (hash.length !== 4 + 2 * nx * ny) return null;
+
+    const maxAc = (b83(hash[1]) + 1) / 166;
+    const colors = [];
+    const dc = b83(hash.slice(2, 6));
+    colors.push([srgbToLinear(dc >> 16), srgbToLinear((dc >> 8) & 255), srgbToLinear(dc & 255)]);
+    for (let i = 1; i < nx * ny; i++) {
+      const v = b83(hash.slice(4 + i * 2, 6 + i * 2));
+      colors.push([
+        signPow((Math.floor(v / 361) - 9) / 9, 2) * maxAc,
+        signPow((Math.floor(v / 19) % 19 - 9) / 9, 2) * maxAc,
+        signPow((v % 19 - 9) / 9, 2) * maxAc
+      ]);
+    }
+
+    const canvas = document.createElement("canvas");
+    canvas.width = w;
+    canvas.height = h;
+    const ctx = canvas.getContext("2d");
+    if (!ctx) return null;
+    const img = ctx.createImageData(w, h);
+
+    for (let y = 0; y < h; y++) {
+      for (let x = 0; x < w; x++) {
+        let r = 0, g = 0, b = 0;
+        for (let j = 0; j < ny; j++) {
+          const cy = Math.cos(Math.PI * y * j / h);
+          for (let i = 0; i < nx; i++) {
+            const basis = Math.cos(Math.PI * x * i / w) * cy;
+            const c = colors[i + j * nx];
+            r += c[0] * basis; g += c[1] * basis; b += c[2] * basis;
+          }
+        }
+        const p = 4 * (x + y * w);
+        img.data[p] = linearToSrgb(r);
+        img.data[p + 1] = linearToSrgb(g);
+        img.data[p + 2] = linearToSrgb(b);
+        img.data[p + 3] = 255;
+      }
+    }
+
+    ctx.putImageData(img, 0, 0);
+    try { return canvas.toDataURL("image/png"); } catch (_) { return null; }
+  }
+
+  // Reserve the tile's aspect ratio and paint colour/blurhash until the thumb arrives
+  function applyPlaceholder(img, meta) {
+    if (!meta) return;
+
+    const w = Number(meta.w), h = Number(meta.h);
+    if (w > 0 && h > 0) {
+      img.width = w;
+      img.height = h;
+      img.style.aspectRatio = `${w} / ${h}`;
+    }
+
+    if (meta.color) img.style.backgroundColor = meta.color;
+
+    if (meta.blurhash) {
+      const pw = 32;
+      const ph = (w > 0 && h > 0) ? Math.max(1, Math.round(pw * h / w)) : 24;
+      const url = blurhashToDataUrl(meta.blurhash, pw, ph);
+      if (url) {
+        img.style.backgroundImage = `url("${url}")`;
+        img.style.backgroundSize = "cover";
+      }
+    }
+
+    img.addEventListener("load", () => {
+      img.style.backgroundImage = "";
+      img.style.backgroundColor = "";
+    }, { once: true });
+  }
+
   // ---------- state ----------
   const state = {
     files: [],
+    meta: {},
     visualOrder: [],
     currentPos: -1,
     folder: "",
@@ -478,6 +586,7 @@
       img.style.height = "auto";
       img.style.display = "block";
       img.style.cursor = "zoom-in";
+      applyPlaceholder(img, state.meta[key]);
 
       const urls = isVideoKey(key) ? thumbCandidates : [...thumbCandidates, origUrl];
 
@@ -659,10 +768,17 @@
     const data = await loadList(folder, token);
     if (!data) return;
 
-    const files = Array.isArray(data.files) ? data.files : [];
+    // /list returns images in "files" and videos in their own "videos" category.
+    // Captured order is kept as returned (videos have no EXIF and follow the photos).
+    const images = Array.isArray(data.files) ? data.files : [];
+    const videos = Array.isArray(data.videos) ? data.videos : [];
+    const files = !videos.length
+      ? images
+      : data.sort === "captured" ? [...images, ...videos] : [...images, ...videos].sort();
     const zipKey = data.zip || data.zipKey || data.zip_key || null;
 
     state.files = files;
+    state.meta = (data.meta && typeof data.meta === "object") ? data.meta : {};
 
     const ok = await probeMediaAccess(files);
     if (!ok) {
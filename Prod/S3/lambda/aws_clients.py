@@ -0,0 +1,76 @@
+import os
+
+import boto3
+from botocore.config import Config
+
+
+# =============================================================================
+# Shared boto3 client factory (packaged into both lambda.zip and lambda-thumb.zip)
+# =============================================================================
+# Default boto3 clients get a 10-connection pool, "legacy"/"standard" retries and
+# 60s timeouts, which throttles parallel listing/thumbnailing and can outlive the
+# Lambda itself. Everything here is tunable via env vars.
+
+# Lambda does not expose its own timeout as an env var, Terraform passes it in
+LAMBDA_TIMEOUT_SECONDS = float(os.getenv("LAMBDA_TIMEOUT_SECONDS", "10"))
+
+BOTO_MAX_POOL_CONNECTIONS = int(os.getenv("BOTO_MAX_POOL_CONNECTIONS", "32"))
+BOTO_RETRY_MODE = os.getenv("BOTO_RETRY_MODE", "adaptive").strip().lower()  # legacy|standard|adaptive
+BOTO_MAX_ATTEMPTS = int(os.getenv("BOTO_MAX_ATTEMPTS", "4"))
+
+# Connect fast or give up; a read may legitimately take longer (large GET/PUT chunks)
+BOTO_CONNECT_TIMEOUT = float(os.getenv("BOTO_CONNECT_TIMEOUT", str(min(2.0, LAMBDA_TIMEOUT_SECONDS / 10))))
+BOTO_READ_TIMEOUT = float(os.getenv("BOTO_READ_TIMEOUT", str(max(1.0, LAMBDA_TIMEOUT_SECONDS / 3))))
+BOTO_TCP_KEEPALIVE = os.getenv("BOTO_TCP_KEEPALIVE", "true").lower() == "true"
+
+_clients = {}
+_resources = {}
+
+
+def client_config(max_pool_connections: int = BOTO_MAX_POOL_CONNECTIONS) -> Config:
+    return Config(
+        max_pool_connections=max_pool_connections,
+        retries={"mode": BOTO_RETRY_MODE, "max_attempts": BOTO_MAX_ATTEMPTS},
+        connect_timeout=BOTO_CONNECT_TIMEOUT,
+        read_timeout=BOTO_READ_TIMEOUT,
+        tcp_keepalive=BOTO_TCP_KEEPALIVE,
+    )
+
+
+def client(service: str, max_pool_connections: int = BOTO_MAX_POOL_CONNECTIONS):
+    """
+    Returns a cached, thread-safe boto3 client (one per service/pool size per container).
+    """
+    k = (service, max_pool_connections)
+    c = _clients.get(k)
+    if c is None:
+        c = boto3.client(service, config=client_config(max_pool_connections))
+        _clients[k] = c
+    return c
+
+
+def resource(service: str):
+    # boto3 resources are NOT thread-safe; only use from the handler thread
+    r = _resources.get(service)
+    if r is None:
+        r = boto3.resource(service, config=client_config())
+        _resources[service] = r
+    return r
+
+
+def s3_presign_client():
+    """
+    S3 client for presigned URLs handed to browsers: SigV4 against the regional
+    virtual-hosted endpoint (the global endpoint redirects, which breaks CORS preflight).
+    """
+    c = _clients.get("s3-presign")
+    if c is None:
+        region = os.getenv("AWS_REGION") or boto3.session.Session().region_name
+        c = boto3.client(
+            "s3",
+            region_name=region,
+            endpoint_url=f"https://s3.{region}.amazonaws.com",
+            config=client_config().merge(Config(signature_version="s3v4", s3={"addressing_style": "virtual"})),
+        )
+        _clients["s3-presign"] = c
+    return c
@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: classifying a synthetic 100k-key listing with media_types.classify vs the
+previous per-kind checks (lowercase the key, then any(endswith) over each extension set).
+
+    python bench_media_types.py [--keys 100000] [--rounds 5]
+
+Pure CPU, no AWS access.
+"""
+import argparse
+import random
+import time
+
+import media_types
+
+IMAGE_EXTS = media_types.parse_exts(media_types.DEFAULT_IMAGE_EXTS)
+VIDEO_EXTS = media_types.parse_exts(media_types.DEFAULT_VIDEO_EXTS)
+ZIP_EXTS = media_types.parse_exts(media_types.DEFAULT_ZIP_EXTS)
+TABLE = media_types.build_ext_table(IMAGE_EXTS, VIDEO_EXTS, ZIP_EXTS)
+
+
+def synthetic_keys(n: int, seed: int = 1) -> list:
+    # Mix seen in real albums: mostly camera JPEGs, some PNG/HEIC/video, sidecars, a zip, folder markers
+    rnd = random.Random(seed)
+    exts = [".JPG"] * 40 + [".jpg"] * 25 + [".jpeg", ".png", ".webp", ".heic", ".MOV", ".mp4",
+                                            ".xmp", ".json", ".zip", "/", ""] * 3
+    keys = []
+    for i in range(n):
+        album = f"gallery/client-{rnd.randrange(200):03d}/2024-{rnd.randrange(1, 13):02d} shoot"
+        keys.append(f"{album}/IMG_{i:06d}{rnd.choice(exts)}")
+    return keys
+
+
+def classify_legacy(key: str) -> str:
+    # What lambda.py/lambda-thumb.py did before media_types: one lowercase + endswith loop per kind
+    if not key or key.endswith("/"):
+        return media_types.OTHER
+    lk = key.lower()
+    if any(lk.endswith(e) for e in IMAGE_EXTS):
+        return media_types.IMAGE
+    lk = key.lower()
+    if any(lk.endswith(e) for e in VIDEO_EXTS):
+        return media_types.VIDEO
+    lk = key.lower()
+    if any(lk.endswith(e) for e in ZIP_EXTS):
+        return media_types.ZIP
+    return media_types.OTHER
+
+
+def classify_table(key: str) -> str:
+    return media_types.classify(key, TABLE)
+
+
+def bench(fn, keys: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for k in keys:
+            fn(k)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--keys", type=int, default=100_000)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    keys = synthetic_keys(args.keys)
+
+    # Both must agree before timing means anything
+    mismatched = [k for k in keys if classify_legacy(k) != classify_table(k)]
+    if mismatched:
+        raise SystemExit(f"classifiers disagree on {len(mismatched)} keys, e.g. {mismatched[:3]}")
+
+    print(f"{len(keys)} keys, best of {args.rounds} rounds")
+    print(f"{'classifier':<10} {'total ms':>9} {'ns/key':>8}")
+    for name, fn in (("legacy", classify_legacy), ("table", classify_table)):
+        t = bench(fn, keys, args.rounds)
+        print(f"{name:<10} {t * 1000:>9.1f} {t / len(keys) * 1e9:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
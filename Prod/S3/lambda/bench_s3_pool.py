@@ -0,0 +1,87 @@
+"""
+Benchmark: parallel S3 calls with a default boto3 client vs the aws_clients factory.
+
+Runs against a real bucket with the caller's credentials (read-only: ListObjectsV2 + HEAD/GET):
+
+    python bench_s3_pool.py --bucket my-gallery --prefix gallery/ --requests 500 --threads 32
+
+Each client issues the same requests from a thread pool, like /list shards and the thumbnailer do.
+A default client has a 10-connection pool, so with more threads than that urllib3 discards
+connections ("Connection pool is full") and the extra requests pay new TCP+TLS handshakes.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+import aws_clients
+
+
+def list_keys(c, bucket: str, prefix: str, limit: int) -> list:
+    keys = []
+    for page in c.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            keys.append(obj["Key"])
+            if len(keys) >= limit:
+                return keys
+    return keys
+
+
+def run(c, bucket: str, keys: list, threads: int, op: str) -> dict:
+    def one(k):
+        t0 = time.perf_counter()
+        if op == "get":
+            c.get_object(Bucket=bucket, Key=k, Range="bytes=0-65535")["Body"].read()
+        else:
+            c.head_object(Bucket=bucket, Key=k)
+        return time.perf_counter() - t0
+
+    # Warm-up: resolve endpoints, load credentials, open the first connection
+    one(keys[0])
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        lat = sorted(pool.map(one, keys))
+    wall = time.perf_counter() - t0
+
+    return {
+        "req_s": len(keys) / wall,
+        "p50_ms": lat[len(lat) // 2] * 1000,
+        "p99_ms": lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000,
+        "wall_s": wall,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--bucket", required=True)
+    ap.add_argument("--prefix", default="gallery/")
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--threads", type=int, default=aws_clients.BOTO_MAX_POOL_CONNECTIONS)
+    ap.add_argument("--op", choices=("head", "get"), default="head")
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    tuned = aws_clients.client("s3")
+    keys = list_keys(tuned, args.bucket, args.prefix, args.requests)
+    if not keys:
+        raise SystemExit(f"no objects under s3://{args.bucket}/{args.prefix}")
+    # Cycle the listing up to --requests calls
+    keys = (keys * (args.requests // len(keys) + 1))[:args.requests]
+
+    clients = {
+        "default": boto3.client("s3"),
+        "aws_clients": tuned,
+    }
+    print(f"{len(keys)} x {args.op} with {args.threads} threads, {args.rounds} rounds "
+          f"(pool={aws_clients.BOTO_MAX_POOL_CONNECTIONS}, retries={aws_clients.BOTO_RETRY_MODE})")
+    print(f"{'client':<12} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'wall s':>8}")
+    for name, c in clients.items():
+        for _ in range(args.rounds):
+            r = run(c, args.bucket, keys, args.threads, args.op)
+            print(f"{name:<12} {r['req_s']:>9.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['wall_s']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: cf_signer load time and sign operations per second per key backend.
+
+    python bench_signer.py                                   # file backend, throwaway 2048-bit key
+    python bench_signer.py --key cf-private.pem              # file backend, your PEM/JSON key file
+    python bench_signer.py --secret-id <arn> --key-pair-id K1  # + Secrets Manager backend (real AWS)
+
+For each backend it reports the cold load (what the first /open paid before preloading),
+then sign() throughput with a fresh key and with a short refresh_seconds (--refresh), so
+several background refreshes run while signing (their cost shows up as lower ops/s).
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import cf_signer
+
+# Same shape as the custom policy /open signs
+POLICY = json.dumps({"Statement": [{
+    "Resource": "https://photos.example.com/gallery/client-001/*",
+    "Condition": {"DateLessThan": {"AWS:EpochTime": 1893456000}},
+}]}, separators=(",", ":")).encode("utf-8")
+
+
+def throwaway_key_file() -> str:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption())
+    fd, path = tempfile.mkstemp(suffix=".pem")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pem)
+    return path
+
+
+def ops_per_second(signer: cf_signer.Signer, seconds: float, threads: int) -> float:
+    done = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(i):
+        n = 0
+        while time.perf_counter() < stop:
+            signer.sign(POLICY)
+            n += 1
+        done[i] = n
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return sum(done) / (time.perf_counter() - t0)
+
+
+def bench_backend(name: str, source, key_pair_id: str, seconds: float, threads: int, refresh: float):
+    signer = cf_signer.Signer(source, key_pair_id)
+    t0 = time.perf_counter()
+    signer.load()
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    fresh = ops_per_second(signer, seconds, threads)
+
+    refreshing = cf_signer.Signer(source, key_pair_id, refresh_seconds=refresh)
+    refreshing.load()
+    refreshed = ops_per_second(refreshing, seconds, threads)
+
+    print(f"{name:<8} {load_ms:>9.1f} {fresh:>12.0f} {refreshed:>14.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--key", help="PEM or JSON key file (default: generate a throwaway key)")
+    ap.add_argument("--secret-id", help="Secrets Manager secret ARN/name (benchmarks that backend too)")
+    ap.add_argument("--key-pair-id", default="BENCH")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--refresh", type=float, default=0.5, help="refresh_seconds for the refresh column")
+    args = ap.parse_args()
+
+    key_path = args.key or throwaway_key_file()
+    try:
+        print(f"sign() for {args.seconds}s on {args.threads} thread(s), refresh column: every {args.refresh}s")
+        print(f"{'backend':<8} {'load ms':>9} {'ops/s fresh':>12} {'ops/s refresh':>14}")
+        bench_backend("file", cf_signer.FileKeySource(key_path), args.key_pair_id, args.seconds, args.threads, args.refresh)
+
+        if args.secret_id:
+            import boto3
+            source = cf_signer.SecretsManagerKeySource(boto3.client("secretsmanager"), args.secret_id)
+            bench_backend("secrets", source, args.key_pair_id, args.seconds, args.threads, args.refresh)
+    finally:
+        if not args.key:
+            os.remove(key_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import base64
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+
+
+# =============================================================================
+# CloudFront policy signer (packaged into lambda.zip)
+# =============================================================================
+# Keys are loaded during Lambda init (not on the first /open) and re-read from
+# their source every SIGNER_REFRESH_SECONDS without blocking a request: the
+# request that notices the key is stale kicks a background refresh and signs
+# with the current key meanwhile.
+#
+# Secret formats:
+#   - plain PEM                   -> one key, id = CLOUDFRONT_KEY_PAIR_ID
+#   - {"active": "<id>",
+#      "keys": {"<id>": "<pem>", "<old-id>": "<pem>"}}
+#                                 -> rotation: sign with "active", keep the
+#                                    other pair loaded until it is dropped
+
+SIGNER_REFRESH_SECONDS = int(os.getenv("SIGNER_REFRESH_SECONDS", "300"))
+
+
+class SecretsManagerKeySource:
+    def __init__(self, sm_client: Any, secret_id: str) -> None:
+        self.sm = sm_client
+        self.secret_id = secret_id
+
+    def fetch(self) -> str:
+        try:
+            resp = self.sm.get_secret_value(SecretId=self.secret_id)
+        except ClientError as e:
+            raise RuntimeError(f"Failed to read secret {self.secret_id}: {e}") from e
+
+        raw = resp.get("SecretString")
+        if not raw:
+            raw = base64.b64decode(resp["SecretBinary"]).decode("utf-8")
+        return raw
+
+
+class FileKeySource:
+    # Local PEM/JSON file (offline tests, local runs); same formats as the secret
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def fetch(self) -> str:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+def parse_keys(raw: str, default_key_pair_id: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Returns (active_key_pair_id, {key_pair_id: private_key}).
+    """
+    raw = (raw or "").strip()
+    if not raw:
+        raise RuntimeError("empty_private_key")
+
+    if raw.startswith("{"):
+        doc = json.loads(raw)
+        pems = doc.get("keys") or {}
+        active = (doc.get("active") or default_key_pair_id or "").strip()
+    else:
+        pems = {default_key_pair_id: raw}
+        active = default_key_pair_id
+
+    keys = {kid: serialization.load_pem_private_key(pem.encode("utf-8"), password=None) for kid, pem in pems.items()}
+    if active not in keys:
+        raise RuntimeError(f"active_key_pair_id_not_in_secret: {active}")
+    return active, keys
+
+
+class Signer:
+    def __init__(self, source: Any, default_key_pair_id: str, refresh_seconds: int = SIGNER_REFRESH_SECONDS) -> None:
+        self.source = source
+        self.default_key_pair_id = default_key_pair_id
+        self.refresh_seconds = refresh_seconds
+
+        self._lock = threading.Lock()
+        self._active: Optional[str] = None
+        self._keys: Dict[str, Any] = {}
+        self._loaded_at = 0.0
+        self._refreshing = False
+
+    def load(self) -> None:
+        active, keys = parse_keys(self.source.fetch(), self.default_key_pair_id)
+        with self._lock:
+            if active != self._active and self._active is not None:
+                print(f"SIGNER_ACTIVE_KEY_CHANGED {self._active} -> {active}")
+            self._active, self._keys = active, keys
+            self._loaded_at = time.time()
+
+    def preload(self) -> bool:
+        # Called at import time; a failure here must not break init, sign() retries synchronously
+        try:
+            self.load()
+            return True
+        except Exception as e:
+            print("SIGNER_PRELOAD_FAILED:", repr(e))
+            return False
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.load()
+        except Exception as e:
+            # Keep signing with the previous key; next stale sign() tries again
+            print("SIGNER_REFRESH_FAILED:", repr(e))
+        finally:
+            self._refreshing = False
+
+    def _current(self) -> Tuple[str, Any]:
+        if self._active is None:
+            self.load()
+
+        stale = False
+        with self._lock:
+            if not self._refreshing and time.time() - self._loaded_at > self.refresh_seconds:
+                self._refreshing = stale = True
+        if stale:
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+        with self._lock:
+            return self._active, self._keys[self._active]
+
+    def key_pair_ids(self) -> Tuple[str, ...]:
+        with self._lock:
+            return tuple(self._keys)
+
+    def sign(self, data: bytes) -> Tuple[bytes, str]:
+        """
+        Returns (signature, key_pair_id). CloudFront requires RSA-SHA1 here.
+        """
+        key_pair_id, key = self._current()
+        return key.sign(data, padding.PKCS1v15(), hashes.SHA1()), key_pair_id
@@ -1,20 +1,29 @@
 import os
+import io
+import math
+import time
+import hashlib
 import posixpath
 import uuid
+import random
 import json
 import traceback
 import shutil
 import resource
-from urllib.parse import unquote_plus
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote_plus, unquote_plus
 
-import boto3
 from botocore.exceptions import ClientError
-from PIL import Image, ImageOps, ImageDraw, ImageFont, ImageFile
+from PIL import Image, ImageOps, ImageDraw, ImageFont, ImageFile, ImageFilter
+
+import aws_clients
+import media_types
 
 # Helps with some imperfect JPEGs (optional but practical)
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
-s3 = boto3.client("s3")
+s3 = aws_clients.client("s3")
 
 # --- Source / destination layout ---
 SOURCE_PREFIX = os.getenv("SOURCE_PREFIX", "gallery/").strip().lstrip("/")
@@ -29,6 +38,23 @@ THUMB_MAX_SIZE = int(os.getenv("THUMB_MAX_SIZE", "640"))
 JPEG_QUALITY   = int(os.getenv("JPEG_QUALITY", "75"))
 CACHE_CONTROL  = os.getenv("CACHE_CONTROL", "public, max-age=31536000, immutable")
 
+# --- Cropped grid rendition (optional): thumbs/<album>/square-of-<file>.<ext> ---
+# Cut from the already-downscaled thumb, so it costs one small crop + resize + encode
+CROP_THUMB_ENABLED = os.getenv("CROP_THUMB_ENABLED", "false").lower() == "true"
+CROP_THUMB_PREFIX = os.getenv("CROP_THUMB_PREFIX", "square-of-")
+CROP_THUMB_RATIO = os.getenv("CROP_THUMB_RATIO", "1:1").strip()    # width:height
+CROP_THUMB_SIZE = int(os.getenv("CROP_THUMB_SIZE", "320"))           # longer output side, px
+CROP_THUMB_MODE = os.getenv("CROP_THUMB_MODE", "saliency").strip().lower()  # saliency|center
+
+# --- Target-size JPEG encoding (0 = off, always JPEG_QUALITY) ---
+# Binary-searches the highest quality in [MIN, MAX] whose output fits the byte budget
+JPEG_TARGET_BYTES = int(os.getenv("JPEG_TARGET_BYTES", "0"))
+JPEG_TARGET_QUALITY_MIN = int(os.getenv("JPEG_TARGET_QUALITY_MIN", "45"))
+JPEG_TARGET_QUALITY_MAX = int(os.getenv("JPEG_TARGET_QUALITY_MAX", "90"))
+JPEG_TARGET_MAX_ATTEMPTS = int(os.getenv("JPEG_TARGET_MAX_ATTEMPTS", "5"))
+# Below MIN_REMAINING_MS + this, stop searching and encode once at JPEG_QUALITY
+JPEG_TARGET_RESERVE_MS = int(os.getenv("JPEG_TARGET_RESERVE_MS", "2000"))
+
 # --- Decider ---
 THUMB_DECIDER_MODE = os.getenv("THUMB_DECIDER_MODE", "bytes").strip().lower()  # bytes|pixels
 THUMB_DECIDER_MIN_MIB = float(os.getenv("THUMB_DECIDER_MIN_MIB", "0"))
@@ -36,12 +62,65 @@ THUMB_DECIDER_MIN_MAXDIM_PX = int(os.getenv("THUMB_DECIDER_MIN_MAXDIM_PX", "0"))
 
 CREATE_THUMB_FOLDER_MARKER = os.getenv("CREATE_THUMB_FOLDER_MARKER", "true").lower() == "true"
 
+# --- Folder index (per-album image metadata served by /list) ---
+# thumbs/<album>/_index.json -> {"images": {"gallery/<album>/file.jpg": {"w":..,"h":..,"taken":..,...}}}
+FOLDER_INDEX_ENABLED = os.getenv("FOLDER_INDEX_ENABLED", "true").lower() == "true"
+FOLDER_INDEX_NAME = os.getenv("FOLDER_INDEX_NAME", "_index.json").strip().strip("/") or "_index.json"
+FOLDER_INDEX_MAX_RETRIES = int(os.getenv("FOLDER_INDEX_MAX_RETRIES", "6"))
+# Conflict backoff: full jitter over base * 2^attempt, capped (ms)
+FOLDER_INDEX_BACKOFF_MS = int(os.getenv("FOLDER_INDEX_BACKOFF_MS", "50"))
+FOLDER_INDEX_BACKOFF_MAX_MS = int(os.getenv("FOLDER_INDEX_BACKOFF_MAX_MS", "1000"))
+BLURHASH_X = int(os.getenv("BLURHASH_COMPONENTS_X", "4"))
+BLURHASH_Y = int(os.getenv("BLURHASH_COMPONENTS_Y", "3"))
+
+# --- Failure ledger / retries ---
+# thumb-failures/<original key>.json: one entry per original still without a thumbnail
+FAILURE_LEDGER_ENABLED = os.getenv("FAILURE_LEDGER_ENABLED", "true").lower() == "true"
+FAILURE_LEDGER_PREFIX = os.getenv("FAILURE_LEDGER_PREFIX", "thumb-failures/").strip().strip("/") + "/"
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "6"))
+RETRY_MAX_PER_RUN = int(os.getenv("RETRY_MAX_PER_RUN", "50"))
+# The thumb queue's redrive maxReceiveCount: deferred messages move to the ledger before the DLQ
+SQS_MAX_RECEIVE_COUNT = int(os.getenv("SQS_MAX_RECEIVE_COUNT", "5"))
+# thumb-failures/_index/<index key>/<id>.json: folder-index entries whose write kept conflicting,
+# replayed by the retry driver (the thumbs themselves were written, no need to decode again)
+INDEX_PENDING_PREFIX = FAILURE_LEDGER_PREFIX + "_index/"
+
+# Originals up to this size are decoded from memory; bigger ones (and the "tmp" strategy) go via /tmp
+INMEM_MAX_MIB = float(os.getenv("INMEM_MAX_MIB", "24"))
+# JPEG draft target for the degraded strategies (smaller -> decoder uses a bigger DCT scale-down)
+LOW_DRAFT_SIZE = int(os.getenv("LOW_DRAFT_SIZE", str(max(1, THUMB_MAX_SIZE // 2))))
+
+# Escalation ladder: a record that already failed n times is retried with STRATEGIES[n]
+STRATEGIES = ("default", "low_draft", "tmp", "placeholder")
+
+# --- Memory-budgeted scheduling of a batch ---
+# Records are ordered by estimated decode cost and only started while
+# RSS + estimate stays under SCHED_MEM_FRACTION of the function's memory.
+SCHED_ENABLED = os.getenv("SCHED_ENABLED", "true").lower() == "true"
+SCHED_MEM_FRACTION = float(os.getenv("SCHED_MEM_FRACTION", "0.8"))
+SCHED_OVERHEAD_MB = float(os.getenv("SCHED_OVERHEAD_MB", "24"))      # encode buffers, PIL/boto temporaries
+SCHED_PROBE_BYTES = int(os.getenv("SCHED_PROBE_BYTES", "131072"))     # ranged GET size for the header probe
+
+# Header not readable from the probe (WebP decodes the whole file to open, TIFF IFDs can sit
+# at the end): guess pixels from the file size, ~0.8 bits/pixel (a high-quality JPEG/WebP is
+# 1-3), capped at the largest image PIL decodes without a DecompressionBombWarning
+SCHED_UNKNOWN_PIXELS_PER_BYTE = float(os.getenv("SCHED_UNKNOWN_PIXELS_PER_BYTE", "10"))
+_UNKNOWN_DIMS_MAX_PIXELS = Image.MAX_IMAGE_PIXELS or 89_478_485
+
 # --- Timeout guard (ms) ---
 # If remaining time is below this, we abort early and LOG it clearly.
 MIN_REMAINING_MS = int(os.getenv("MIN_REMAINING_MS", "2500"))
 
-IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff", ".bmp", ".gif"}
-VIDEO_EXTS = {".mp4", ".mov", ".webm", ".m4v", ".avi"}
+IMAGE_EXTS = media_types.parse_exts(os.getenv("IMAGE_EXTS", ".jpg,.jpeg,.png,.webp,.tif,.tiff,.bmp,.gif"))
+VIDEO_EXTS = media_types.parse_exts(os.getenv("VIDEO_EXTS", ".mp4,.mov,.webm,.m4v,.avi"))
+MEDIA_EXT_TABLE = media_types.build_ext_table(IMAGE_EXTS, VIDEO_EXTS, ())
+
+# Identifies the output settings a ledger entry failed under; a change resets its attempts
+SETTINGS_HASH = hashlib.sha1(json.dumps([
+    THUMB_MAX_SIZE, JPEG_QUALITY, JPEG_TARGET_BYTES, THUMB_ROOT_PREFIX, THUMB_PREFIX,
+    THUMB_DECIDER_MODE, THUMB_DECIDER_MIN_MIB, THUMB_DECIDER_MIN_MAXDIM_PX, LOW_DRAFT_SIZE,
+    CROP_THUMB_ENABLED, CROP_THUMB_PREFIX, CROP_THUMB_RATIO, CROP_THUMB_SIZE, CROP_THUMB_MODE,
+]).encode("utf-8")).hexdigest()[:12]
 
 
 class SoftTimeout(Exception):
@@ -52,18 +131,6 @@ def log(obj):
     print(json.dumps(obj, ensure_ascii=False))
 
 
-def _ext(key: str) -> str:
-    return (posixpath.splitext(key)[1] or "").lower()
-
-
-def is_image_key(key: str) -> bool:
-    return _ext(key) in IMAGE_EXTS
-
-
-def is_video_key(key: str) -> bool:
-    return _ext(key) in VIDEO_EXTS
-
-
 def is_thumb_key(key: str) -> bool:
     return key.startswith(THUMB_ROOT_PREFIX)
 
@@ -73,8 +140,8 @@ def _rel_from_source(key: str) -> str:
     return rel.lstrip("/")
 
 
-def thumb_key_for(original_key: str, out_ext: str) -> str:
-    # thumbs/<album>/thumb-of-<file>.<out_ext>
+def thumb_key_for(original_key: str, out_ext: str, file_prefix: str = THUMB_PREFIX) -> str:
+    # thumbs/<album>/thumb-of-<file>.<out_ext>  (file_prefix selects the rendition)
     rel = _rel_from_source(original_key)
     rel_dir = posixpath.dirname(rel)   # <album>
     base = posixpath.basename(rel)     # file.ext
@@ -86,19 +153,39 @@ def thumb_key_for(original_key: str, out_ext: str) -> str:
     )
 
     base_no_ext = base.replace(posixpath.splitext(base)[1], "")
-    thumb_base = f"{THUMB_PREFIX}{base_no_ext}{out_ext}"
+    thumb_base = f"{file_prefix}{base_no_ext}{out_ext}"
     return posixpath.join(dest_dir, thumb_base)
 
 
-def ensure_thumb_folder_marker(bucket: str, original_key: str):
+def rendition_keys_for(original_key: str) -> list:
+    # Every object the thumb pipeline may have written for this original
+    # (crop renditions too, even if currently disabled, so deletes still clean them up)
+    return [
+        thumb_key_for(original_key, ext, prefix)
+        for prefix in (THUMB_PREFIX, CROP_THUMB_PREFIX)
+        for ext in (".jpg", ".png")
+    ]
+
+
+def thumb_dir_for(original_key: str) -> str:
+    # thumbs/<album>/
     rel = _rel_from_source(original_key)
     rel_dir = posixpath.dirname(rel)
-    marker_key = (
+    return (
         (posixpath.join(THUMB_ROOT_PREFIX.rstrip("/"), rel_dir) + "/")
         if rel_dir and rel_dir != "."
         else THUMB_ROOT_PREFIX
     )
 
+
+def folder_index_key_for(original_key: str) -> str:
+    # thumbs/<album>/_index.json
+    return thumb_dir_for(original_key) + FOLDER_INDEX_NAME
+
+
+def ensure_thumb_folder_marker(bucket: str, original_key: str):
+    marker_key = thumb_dir_for(original_key)
+
     try:
         s3.head_object(Bucket=bucket, Key=marker_key)
         return
@@ -140,6 +227,317 @@ def should_process_by_pixels(max_dim: int) -> bool:
     return True if thr <= 0 else (max_dim >= thr)
 
 
+def orientation_of(w: int, h: int) -> str:
+    if w > h:
+        return "landscape"
+    if h > w:
+        return "portrait"
+    return "square"
+
+
+def dominant_color(img: Image.Image) -> str:
+    # Most common colour of a tiny palette-reduced copy (cheap on an already-downscaled image)
+    small = img.convert("RGB")
+    small.thumbnail((64, 64), Image.Resampling.BILINEAR)
+    pal = small.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    counts = sorted(pal.getcolors() or [], reverse=True)
+    if not counts:
+        r, g, b = small.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    else:
+        palette = pal.getpalette() or []
+        i = counts[0][1] * 3
+        r, g, b = palette[i:i + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+_B83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _b83(value: int, length: int) -> str:
+    return "".join(_B83[(value // (83 ** (length - i - 1))) % 83] for i in range(length))
+
+
+def _srgb_to_linear(v: int) -> float:
+    x = v / 255.0
+    return x / 12.92 if x <= 0.04045 else ((x + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(v: float) -> int:
+    x = max(0.0, min(1.0, v))
+    if x <= 0.0031308:
+        return int(x * 12.92 * 255 + 0.5)
+    return int((1.055 * (x ** (1 / 2.4)) - 0.055) * 255 + 0.5)
+
+
+def blurhash_encode(img: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    # https://github.com/woltapp/blurhash (encoder), computed on a <=32px copy
+    x_components = max(1, min(9, x_components))
+    y_components = max(1, min(9, y_components))
+
+    small = img.convert("RGB")
+    small.thumbnail((32, 32), Image.Resampling.BILINEAR)
+    w, h = small.size
+    lin = [(_srgb_to_linear(r), _srgb_to_linear(g), _srgb_to_linear(b)) for r, g, b in small.getdata()]
+
+    cos_x = [[math.cos(math.pi * i * x / w) for x in range(w)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / h) for y in range(h)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            norm = 1.0 if (i == 0 and j == 0) else 2.0
+            r = g = b = 0.0
+            for y in range(h):
+                cy = cos_y[j][y] * norm
+                row = y * w
+                cxs = cos_x[i]
+                for x in range(w):
+                    basis = cy * cxs[x]
+                    pr, pg, pb = lin[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1.0 / (w * h)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    out = _b83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(c) for f in ac for c in f)
+        q_max = max(0, min(82, int(math.floor(actual_max * 166 - 0.5))))
+        max_value = (q_max + 1) / 166.0
+        out += _b83(q_max, 1)
+    else:
+        max_value = 1.0
+        out += _b83(0, 1)
+
+    out += _b83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    for f in ac:
+        q = [
+            max(0, min(18, int(math.floor(math.copysign(abs(c / max_value) ** 0.5, c) * 9 + 9.5))))
+            for c in f
+        ]
+        out += _b83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+
+    return out
+
+
+def _exif_text(v) -> str:
+    if isinstance(v, bytes):
+        v = v.decode("utf-8", "ignore")
+    return str(v or "").replace("\x00", "").strip()
+
+
+def exif_meta(exif) -> dict:
+    """
+    Capture time, camera, lens, GPS presence and EXIF orientation from an already-read
+    EXIF block (no extra decode). Missing fields are omitted. GPS coordinates are not stored.
+    "taken" is the camera's local time as "YYYY-MM-DDTHH:MM:SS[.sss]" so it sorts as a string.
+    """
+    if not exif:
+        return {}
+    out = {}
+    try:
+        ifd = exif.get_ifd(0x8769)  # Exif sub-IFD
+
+        raw = _exif_text(ifd.get(0x9003) or ifd.get(0x9004) or exif.get(0x0132))  # DateTimeOriginal/Digitized/DateTime
+        if len(raw) >= 19 and raw[4] == ":" and raw[7] == ":" and not raw.startswith("0000"):
+            taken = raw[:10].replace(":", "-") + "T" + raw[11:19]
+            subsec = _exif_text(ifd.get(0x9291))  # SubSecTimeOriginal: keeps burst shots in order
+            if subsec.isdigit():
+                taken += "." + subsec
+            out["taken"] = taken
+            offset = _exif_text(ifd.get(0x9011))  # OffsetTimeOriginal, e.g. "+02:00"
+            if offset:
+                out["tz"] = offset
+
+        make, model = _exif_text(exif.get(0x010F)), _exif_text(exif.get(0x0110))
+        camera = model if make and model.lower().startswith(make.lower()) else f"{make} {model}".strip()
+        if camera:
+            out["camera"] = camera
+
+        lens = _exif_text(ifd.get(0xA434))
+        if lens:
+            out["lens"] = lens
+
+        if exif.get_ifd(0x8825):
+            out["gps"] = True
+
+        orientation = exif.get(0x0112)
+        if orientation:
+            out["exif_orientation"] = int(orientation)
+    except Exception as e:
+        log({"WARN": "exif_parse_failed", "msg": str(e)})
+    return out
+
+
+def image_meta(img: Image.Image, w: int, h: int, exif=None) -> dict:
+    # img is the downscaled (thumbnail) image, w/h are the ORIGINAL display dimensions
+    return {
+        "w": int(w),
+        "h": int(h),
+        "orientation": orientation_of(w, h),
+        "color": dominant_color(img),
+        "blurhash": blurhash_encode(img, BLURHASH_X, BLURHASH_Y),
+        **exif_meta(exif),
+    }
+
+
+def _parse_ratio(raw: str) -> float:
+    try:
+        a, b = raw.split(":", 1)
+        r = float(a) / float(b)
+        return r if r > 0 else 1.0
+    except (ValueError, ZeroDivisionError):
+        return 1.0
+
+
+def _saliency_offset(img: Image.Image, horizontal: bool, win: int) -> int:
+    """
+    Offset of the win-pixel window along one axis with the most edge energy
+    (cheap saliency proxy), computed on a <=128px grayscale copy.
+    Flat images, and ties with the centre, keep the centre crop.
+    """
+    full = img.size[0] if horizontal else img.size[1]
+    centre = (full - win) // 2
+
+    scale = min(1.0, 128.0 / max(img.size))
+    small = img.convert("L").resize(
+        (max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale))), Image.Resampling.BILINEAR
+    )
+    edges = small.filter(ImageFilter.FIND_EDGES)
+    n = edges.size[0] if horizontal else edges.size[1]
+    # One BOX resize collapses the other axis: mean edge energy per column (or row)
+    strip = edges.resize((n, 1) if horizontal else (1, n), Image.Resampling.BOX)
+    energy = list(strip.getdata())
+    if n > 2:
+        energy[0] = energy[-1] = 0  # FIND_EDGES lights up the image border
+
+    w = max(1, min(n, round(win * n / float(full))))
+    prefix = [0]
+    for e in energy:
+        prefix.append(prefix[-1] + e)
+    sums = [prefix[i + w] - prefix[i] for i in range(n - w + 1)]
+
+    best = max(sums)
+    if best <= 0 or best - min(sums) < 0.05 * best:
+        return centre
+
+    # Among near-best windows prefer the one nearest the centre (stable framing)
+    c = (n - w) / 2.0
+    i = min((i for i, v in enumerate(sums) if v >= 0.99 * best), key=lambda i: abs(i - c))
+    return max(0, min(full - win, round(i * full / float(n))))
+
+
+def crop_box_for(img: Image.Image, ratio: float, mode: str) -> tuple:
+    w, h = img.size
+    if w / float(h) > ratio:
+        cw, ch = max(1, round(h * ratio)), h
+    else:
+        cw, ch = w, max(1, round(w / ratio))
+    if (cw, ch) == (w, h):
+        return 0, 0, w, h
+
+    horizontal = cw < w
+    off = (w - cw) // 2 if horizontal else (h - ch) // 2
+    if mode == "saliency":
+        try:
+            off = _saliency_offset(img, horizontal, cw if horizontal else ch)
+        except Exception as e:
+            log({"WARN": "saliency_crop_failed", "msg": str(e)})
+    return (off, 0, off + cw, h) if horizontal else (0, off, w, off + ch)
+
+
+def render_crop_thumb(img: Image.Image) -> Image.Image:
+    ratio = _parse_ratio(CROP_THUMB_RATIO)
+    out = img.crop(crop_box_for(img, ratio, CROP_THUMB_MODE))
+    size = (CROP_THUMB_SIZE, max(1, round(CROP_THUMB_SIZE / ratio))) if ratio >= 1 else \
+           (max(1, round(CROP_THUMB_SIZE * ratio)), CROP_THUMB_SIZE)
+    out.thumbnail(size, Image.Resampling.LANCZOS)  # never upscales small originals
+    return out
+
+
+def _read_folder_index(bucket: str, index_key: str):
+    try:
+        resp = s3.get_object(Bucket=bucket, Key=index_key)
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code", "")
+        if code in ("404", "NoSuchKey", "NotFound"):
+            return {}, None
+        raise
+
+    try:
+        doc = json.loads(resp["Body"].read() or b"{}")
+    except ValueError:
+        doc = {}
+    if not isinstance(doc, dict):
+        doc = {}
+    return doc, resp.get("ETag")
+
+
+def update_folder_index(bucket: str, index_key: str, entries: dict):
+    """
+    Merge entries ({original_key: meta or None to drop}) into thumbs/<album>/_index.json.
+    Concurrent invocations may write the same index, so writes are conditional
+    (If-Match on the ETag we read, If-None-Match for a new file) and retried.
+    """
+    for attempt in range(1, FOLDER_INDEX_MAX_RETRIES + 1):
+        doc, etag = _read_folder_index(bucket, index_key)
+        images = doc.get("images") if isinstance(doc.get("images"), dict) else {}
+        for k, v in entries.items():
+            # None marks an original that was deleted
+            if v is None:
+                images.pop(k, None)
+            else:
+                images[k] = v
+        doc = {"version": 1, "updated": int(time.time()), "images": images}
+
+        args = {
+            "Bucket": bucket,
+            "Key": index_key,
+            "Body": json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            "ContentType": "application/json",
+            "CacheControl": "no-store",
+        }
+        if etag:
+            args["IfMatch"] = etag
+        else:
+            args["IfNoneMatch"] = "*"
+
+        try:
+            s3.put_object(**args)
+            return
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code", "")
+            if code not in ("PreconditionFailed", "ConditionalRequestConflict", "412", "409"):
+                raise
+            # Jittered so invocations racing on one album do not retry in lockstep
+            delay_ms = random.uniform(0, min(FOLDER_INDEX_BACKOFF_MAX_MS, FOLDER_INDEX_BACKOFF_MS * 2 ** attempt))
+            log({"INDEX_CONFLICT": index_key, "attempt": attempt, "code": code, "backoff_ms": round(delay_ms)})
+            time.sleep(delay_ms / 1000.0)
+
+    raise RuntimeError(f"Folder index update kept conflicting: {index_key}")
+
+
+def flush_folder_indexes(pending: dict, out: dict) -> list:
+    # pending: {(bucket, index_key): {original_key: meta}}; returns the refs that failed
+    failed = []
+    for (bucket, index_key), entries in pending.items():
+        if not entries:
+            continue
+        try:
+            update_folder_index(bucket, index_key, entries)
+            out["indexed"] += len(entries)
+            log({"OK": "folder_index", "index": index_key, "entries": len(entries)})
+        except Exception as e:
+            out["errors"] += 1
+            failed.append((bucket, index_key))
+            log({"ERROR": type(e).__name__, "msg": str(e), "index": index_key, "trace": traceback.format_exc()})
+    return failed
+
+
 def get_rss_mb() -> float:
     # Best-effort RSS (memory currently used by the process)
     try:
@@ -202,20 +600,138 @@ def guard_time(context, phase: str, key: str):
         raise SoftTimeout(f"Not enough time remaining ({remaining}ms) at phase={phase} key={key}")
 
 
+def _encode(im: Image.Image, fmt: str, **save_kwargs) -> bytes:
+    buf = io.BytesIO()
+    im.save(buf, format=fmt, **save_kwargs)
+    return buf.getvalue()
+
+
+def _time_for_search(context) -> bool:
+    try:
+        remaining = int(context.get_remaining_time_in_millis())
+    except Exception:
+        return True
+    return remaining >= MIN_REMAINING_MS + JPEG_TARGET_RESERVE_MS
+
+
+def encode_jpeg(im: Image.Image, context) -> tuple:
+    """
+    Encodes im (RGB/L) as JPEG in memory.
+    Returns (data, quality, attempts). With JPEG_TARGET_BYTES set, quality is the highest
+    one tried whose output fits the budget (or the smallest tried if none fits).
+    """
+    kwargs = {"optimize": True, "progressive": True}
+    if JPEG_TARGET_BYTES <= 0 or not _time_for_search(context):
+        return _encode(im, "JPEG", quality=JPEG_QUALITY, **kwargs), JPEG_QUALITY, 1
+
+    lo, hi = JPEG_TARGET_QUALITY_MIN, JPEG_TARGET_QUALITY_MAX
+    best = None    # (data, q) highest quality that fits
+    smallest = None
+    attempts = 0
+
+    # Start at the fixed quality: most thumbs are decided in one or two encodes
+    q = max(lo, min(hi, JPEG_QUALITY))
+    while lo <= hi and attempts < JPEG_TARGET_MAX_ATTEMPTS:
+        if attempts and not _time_for_search(context):
+            break
+        data = _encode(im, "JPEG", quality=q, **kwargs)
+        attempts += 1
+        if smallest is None or len(data) < len(smallest[0]):
+            smallest = (data, q)
+        if len(data) <= JPEG_TARGET_BYTES:
+            best = (data, q)
+            lo = q + 1
+            # Flat images fit easily: probe the top once instead of bisecting up to it
+            q = hi if attempts == 1 else (lo + hi) // 2
+        else:
+            hi = q - 1
+            q = (lo + hi) // 2
+
+    data, q = best or smallest
+    return data, q, attempts
+
+
 def get_object_size_head(bucket: str, key: str) -> int:
     head = s3.head_object(Bucket=bucket, Key=key)
     return int(head.get("ContentLength", 0) or 0)
 
 
-def render_video_placeholder(out_path: str, size: int, label: str = "VIDEO"):
+def source_exists(bucket: str, key: str) -> bool:
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code", "")
+        if code in ("404", "NoSuchKey", "NotFound"):
+            return False
+        if code not in ("403", "AccessDenied"):
+            raise
+
+    # 403 is not "gone": it may be a permission mistake, and answering False would delete the
+    # thumbs of an original that still exists. Ask the listing (ListBucket on gallery/*) instead;
+    # if that is denied too, the ClientError propagates and the message is retried.
+    resp = s3.list_objects_v2(Bucket=bucket, Prefix=key, MaxKeys=1)
+    return any(obj.get("Key") == key for obj in resp.get("Contents", []))
+
+
+def real_thumb_exists(bucket: str, key: str) -> bool:
+    # Placeholders carry x-amz-meta-placeholder; any other thumb was decoded from the original
+    for tk in (thumb_key_for(key, ".jpg"), thumb_key_for(key, ".png")):
+        try:
+            head = s3.head_object(Bucket=bucket, Key=tk)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code", "") in ("404", "NoSuchKey", "NotFound"):
+                continue
+            raise
+        if (head.get("Metadata") or {}).get("placeholder") != "true":
+            return True
+    return False
+
+
+def existing_keys(bucket: str, keys: list) -> list:
+    """
+    The keys that currently exist, from one listing per extension-less stem (the .jpg and .png
+    renditions of a thumb share one) rather than a HEAD per key.
+    """
+    wanted = set(keys)
+    found = set()
+    paginator = s3.get_paginator("list_objects_v2")
+    for stem in sorted({posixpath.splitext(k)[0] for k in keys}):
+        for page in paginator.paginate(Bucket=bucket, Prefix=stem):
+            found.update(o["Key"] for o in page.get("Contents", []) if o["Key"] in wanted)
+    return [k for k in keys if k in found]
+
+
+def delete_keys(bucket: str, keys: list) -> int:
+    """
+    Deletes keys with DeleteObjects in 1,000-key chunks (the API maximum).
+    Returns how many were deleted; per-key errors are logged, not raised. A missing key is
+    not an error in quiet mode, so pass keys known to exist (see existing_keys) for a true count.
+    """
+    deleted = 0
+    for i in range(0, len(keys), 1000):
+        chunk = keys[i:i + 1000]
+        resp = s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True},
+        )
+        errors = resp.get("Errors", [])
+        for e in errors:
+            log({"ERROR": "DeleteFailed", "key": e.get("Key"), "code": e.get("Code"), "msg": e.get("Message")})
+        deleted += len(chunk) - len(errors)
+    return deleted
+
+
+def render_video_placeholder(out_path: str, size: int, label: str = "VIDEO", play_icon: bool = True):
     w = max(240, int(size))
     h = max(135, int(w * 9 / 16))
     im = Image.new("RGB", (w, h), (12, 12, 12))
     draw = ImageDraw.Draw(im)
 
-    cx, cy = w // 2, h // 2
-    tri = [(cx - w//12, cy - h//10), (cx - w//12, cy + h//10), (cx + w//10, cy)]
-    draw.polygon(tri, fill=(240, 240, 240))
+    if play_icon:
+        cx, cy = w // 2, h // 2
+        tri = [(cx - w//12, cy - h//10), (cx - w//12, cy + h//10), (cx + w//10, cy)]
+        draw.polygon(tri, fill=(240, 240, 240))
 
     try:
         font = ImageFont.load_default()
@@ -232,155 +748,938 @@ def render_video_placeholder(out_path: str, size: int, label: str = "VIDEO"):
     im.save(out_path, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
 
 
-def lambda_handler(event, context):
-    records = event.get("Records", [])
-    out = {"processed": 0, "skipped": 0, "errors": 0}
+class MemoryBudgetDeferred(Exception):
+    pass
 
-    mode = THUMB_DECIDER_MODE if THUMB_DECIDER_MODE in ("bytes", "pixels") else "bytes"
 
-    log_capacity(context, "START", {"records": len(records), "mode": mode})
+def probe_dims(bucket: str, key: str):
+    # Image size from the first SCHED_PROBE_BYTES (ranged GET); None if the header is not in there.
+    # A missing original raises (ClientError 404) so the caller does not price a file that is gone.
+    try:
+        head = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{SCHED_PROBE_BYTES - 1}")["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code", "") in ("404", "NoSuchKey", "NotFound"):
+            raise
+        return None
+    except Exception:
+        return None
+    try:
+        with Image.open(io.BytesIO(head)) as im:
+            return im.size
+    except Exception:
+        return None
+
+
+def estimate_mb(size: int, dims, ext: str, strategy: str) -> float:
+    """
+    Projected peak memory (MiB) of process_record for one image under a strategy:
+    in-memory source bytes + decoded pixels (after JPEG draft) x2 for transpose/resize copies.
+    """
+    if strategy == "placeholder":
+        return SCHED_OVERHEAD_MB
+
+    via_tmp = strategy == "tmp" or size > int(INMEM_MAX_MIB * 1024 * 1024)
+    draft_size = THUMB_MAX_SIZE if strategy == "default" else LOW_DRAFT_SIZE
+
+    if dims:
+        w, h = dims
+        if ext in (".jpg", ".jpeg"):
+            # draft() picks the largest 1/2, 1/4, 1/8 DCT scale still >= draft_size
+            scale = 1
+            while scale < 8 and max(w, h) // (scale * 2) >= draft_size:
+                scale *= 2
+            w, h = -(-w // scale), -(-h // scale)
+        pixels = w * h
+    else:
+        # Estimate unknown, not huge: a failed probe must not price the file out of every batch
+        pixels = min(int(size * SCHED_UNKNOWN_PIXELS_PER_BYTE), _UNKNOWN_DIMS_MAX_PIXELS)
+
+    src = 0 if via_tmp else size
+    return (src + pixels * 4 * 2) / (1024.0 * 1024.0) + SCHED_OVERHEAD_MB
+
+
+def plan_item(msg_id, prior_failures: int, r: dict, mode: str) -> dict:
+    """
+    Work item for one record: its strategy (from the ledger's attempt count) and, with
+    SCHED_ENABLED, a cost estimate {"est": {strategy: MiB}, ...}. Cheap items (removals,
+    non-images, keys process_record will skip) get the flat overhead and no S3 calls.
+    """
+    item = {"msg_id": msg_id, "prior": prior_failures, "r": r, "key": record_key(r),
+            "strategy": "default", "ledgered": False, "est": {}, "size": 0, "dims": None}
+    key, bucket = item["key"], record_bucket(r)
+    flat = {s: SCHED_OVERHEAD_MB for s in STRATEGIES}
+
+    kind = media_types.classify(key, MEDIA_EXT_TABLE)
+    thumbable = (bool(key) and bool(bucket) and not r.get("eventName", "").startswith("ObjectRemoved")
+                 and key.startswith(SOURCE_PREFIX) and not key.endswith("/") and not is_thumb_key(key)
+                 and kind in (media_types.IMAGE, media_types.VIDEO))
+
+    if thumbable:
+        entry = safe_ledger(read_failure, bucket, key)
+        item["ledgered"] = entry is not None
+        item["strategy"] = strategy_for_attempt(ledger_attempts(entry, r))
+
+    if not SCHED_ENABLED or not thumbable or kind != media_types.IMAGE:
+        item["est"] = flat
+        return item
 
-    for r in records:
-        src_tmp = None
-        out_tmp = None
+    try:
+        size = int(r["s3"]["object"].get("size", 0) or 0)
+        if size <= 0:
+            size = get_object_size_head(bucket, key)
+            r["s3"]["object"]["size"] = size  # process_record then skips its own HEAD
+    except Exception:
+        # Let process_record hit (and report) the real error
+        item["est"] = flat
+        return item
 
-        try:
-            bucket = r["s3"]["bucket"]["name"]
-            key = unquote_plus(r["s3"]["object"]["key"])
-            event_name = r.get("eventName", "unknown")
+    if mode == "bytes" and not should_process_by_bytes(size) and not FOLDER_INDEX_ENABLED:
+        item.update(size=size, est=flat)  # decider skips it without decoding (else decoded for index meta)
+        return item
 
-            # S3 event size is NOT always present/accurate (multipart/copy flows often give 0)
-            event_size = r["s3"]["object"].get("size", 0)
-            obj_size = int(event_size or 0)
+    # Always read the header (<= SCHED_PROBE_BYTES): compressed size is no proxy for decoded size
+    ext = media_types.ext_of(key)
+    try:
+        dims = probe_dims(bucket, key)
+    except ClientError:
+        # Original is gone: process_record reports/skips it without decoding anything
+        item.update(size=size, est=flat)
+        return item
+    item.update(size=size, dims=dims, est={s: estimate_mb(size, dims, ext, s) for s in STRATEGIES})
+    return item
+
+
+def plan_batch(work: list, mode: str, budget_mb: float) -> list:
+    """
+    Plans every record (ledger reads, HEAD/header probes run concurrently). With SCHED_ENABLED
+    the batch is ordered: records that cannot fit even at the lowest RSS first (only the first
+    record of an invocation is admitted over budget, so anywhere else they would be deferred
+    every time), then redelivered records (most deliveries first), then cheapest first, so one
+    huge original cannot starve or time out the small ones.
+    """
+    if len(work) > 1:
+        with ThreadPoolExecutor(max_workers=min(8, len(work))) as pool:
+            items = list(pool.map(lambda w: plan_item(*w, mode), work))
+    else:
+        items = [plan_item(*w, mode) for w in work]
+
+    if not SCHED_ENABLED:
+        return items
+
+    rss = get_rss_mb()
+    items.sort(key=lambda it: (0 if rss + min(it["est"][s] for s in admit_ladder(it)) > budget_mb else 1,
+                               -it["prior"], it["est"][it["strategy"]]))
+    log({"SCHED": "plan", "order": [
+        {"key": it["key"], "est_mb": round(it["est"][it["strategy"]], 1), "strategy": it["strategy"],
+         "size": it["size"], "dims": it["dims"]}
+        for it in items
+    ]})
+    return items
+
+
+def hand_back(item: dict, phase: str, exc: BaseException, deferred_msgs: set):
+    """
+    Hands back a record that was not attempted. SQS messages are released for a quick
+    redelivery (deferred_msgs), except on their last deliveries before SQS_MAX_RECEIVE_COUNT:
+    a message deferred every time would reach the DLQ without ever running, so it is recorded
+    in the ledger instead (count=False: not an attempt) and acked for the retry driver.
+    Direct invocations only have the ledger.
+    """
+    msg_id, r = item["msg_id"], item["r"]
+    if msg_id and item["prior"] + 2 < SQS_MAX_RECEIVE_COUNT:
+        deferred_msgs.add(msg_id)
+        return
+
+    bucket, key = record_bucket(r), record_key(r)
+    entry = None
+    if bucket and key:
+        entry = safe_ledger(record_failure, bucket, key, phase, exc, item["strategy"], False)
+    if msg_id and entry is None:
+        deferred_msgs.add(msg_id)  # no ledger entry to fall back on: redelivery is all there is
+
+
+def admit_ladder(item: dict) -> tuple:
+    # Strategies admit may run item with: its own and the cheaper ones after it
+    ladder = STRATEGIES[STRATEGIES.index(item["strategy"]):]
+    if item["strategy"] != "placeholder":
+        ladder = tuple(s for s in ladder if s != "placeholder")  # never degrade to a placeholder just to fit
+    return ladder
+
+
+def admit(item: dict, budget_mb: float, started: int):
+    """
+    Returns the strategy to run item with now (its own, or a cheaper one further down the
+    ladder that fits the budget), or None to defer it. The first record of an invocation
+    is always admitted: deferring it could never do better.
+    """
+    rss = get_rss_mb()
+    ladder = admit_ladder(item)
+    for s in ladder:
+        if rss + item["est"][s] <= budget_mb:
+            if s != item["strategy"]:
+                log({"SCHED": "downgrade", "key": item["key"], "from": item["strategy"], "to": s,
+                     "rss_mb": round(rss, 1), "est_mb": round(item["est"][s], 1), "budget_mb": round(budget_mb, 1)})
+            return s
+
+    if started == 0:
+        s = ladder[-1]
+        log({"SCHED": "admit_over_budget_first", "key": item["key"], "strategy": s,
+             "rss_mb": round(rss, 1), "est_mb": round(item["est"][s], 1), "budget_mb": round(budget_mb, 1)})
+        return s
+
+    log({"SCHED": "defer", "key": item["key"], "rss_mb": round(rss, 1),
+         "est_mb": round(item["est"][item["strategy"]], 1), "budget_mb": round(budget_mb, 1)})
+    return None
+
+
+def strategy_for_attempt(prior_failures: int) -> str:
+    return STRATEGIES[max(0, min(int(prior_failures), len(STRATEGIES) - 1))]
+
+
+def event_epoch(r: dict):
+    # S3 eventTime ("2024-06-01T11:00:00.123Z") as epoch seconds; None when absent (retry driver)
+    try:
+        return int(datetime.fromisoformat(r["eventTime"].replace("Z", "+00:00")).timestamp())
+    except Exception:
+        return None
 
-            # Multipart-safe: if size missing/0, fetch real size from HEAD
-            if obj_size <= 0:
-                obj_size = get_object_size_head(bucket, key)
 
-            log({
-                "EVENT": event_name,
-                "key": key,
-                "event_size": event_size,
-                "size_used": obj_size,
-            })
+def ledger_attempts(entry, r: dict) -> int:
+    """
+    Real failed attempts for a record, from its ledger entry. Deliveries are not attempts:
+    redeliveries after a deferral, a soft timeout or a crashed batch must not escalate.
+    An upload newer than the last failure is new content and starts over at "default".
+    """
+    if not entry or entry.get("settings_hash") != SETTINGS_HASH:
+        return 0
+    t = event_epoch(r)
+    if t is not None and t > int(entry.get("last_failed", 0) or 0):
+        return 0
+    return int(entry.get("attempts", 0) or 0)
 
-            guard_time(context, "precheck", key)
 
-            if not key.startswith(SOURCE_PREFIX) or key.endswith("/") or is_thumb_key(key):
-                out["skipped"] += 1
-                log({"SKIP": "not_source_or_folder_or_thumb", "key": key})
-                continue
+def ledger_key_for(original_key: str) -> str:
+    # thumb-failures/gallery/<album>/<file>.json
+    return FAILURE_LEDGER_PREFIX + original_key + ".json"
 
-            img = is_image_key(key)
-            vid = is_video_key(key)
-            if not (img or vid):
-                out["skipped"] += 1
-                log({"SKIP": "not_image_or_video", "key": key})
-                continue
 
-            if mode == "bytes" and not should_process_by_bytes(obj_size):
+def read_failure(bucket: str, original_key: str):
+    try:
+        resp = s3.get_object(Bucket=bucket, Key=ledger_key_for(original_key))
+        return json.loads(resp["Body"].read() or b"{}")
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code", "")
+        if code in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    except ValueError:
+        return None
+
+
+def record_failure(bucket: str, original_key: str, phase: str, exc: BaseException, strategy: str,
+                   count: bool = True) -> dict:
+    # count=False: the record was never attempted (left for later), keep the attempt count as is
+    prev = read_failure(bucket, original_key) or {}
+    same_settings = prev.get("settings_hash") == SETTINGS_HASH
+    now = int(time.time())
+
+    entry = {
+        "key": original_key,
+        "phase": phase,
+        "error": type(exc).__name__,
+        "msg": str(exc)[:500],
+        "strategy": strategy,
+        "attempts": (int(prev.get("attempts", 0) or 0) if same_settings else 0) + (1 if count else 0),
+        "settings_hash": SETTINGS_HASH,
+        "first_failed": int(prev.get("first_failed", now) or now) if same_settings else now,
+        "last_failed": now,
+    }
+    s3.put_object(
+        Bucket=bucket,
+        Key=ledger_key_for(original_key),
+        Body=json.dumps(entry, ensure_ascii=False).encode("utf-8"),
+        ContentType="application/json",
+        CacheControl="no-store",
+    )
+    log({"LEDGER": "recorded", **entry})
+    return entry
+
+
+def clear_failure(bucket: str, original_key: str):
+    s3.delete_object(Bucket=bucket, Key=ledger_key_for(original_key))
+    log({"LEDGER": "cleared", "key": original_key})
+
+
+def record_index_pending(bucket: str, index_key: str, entries: dict) -> str:
+    # One object per failed flush (never overwritten), so concurrent writers cannot lose entries
+    lk = f"{INDEX_PENDING_PREFIX}{index_key}/{uuid.uuid4().hex}.json"
+    s3.put_object(
+        Bucket=bucket,
+        Key=lk,
+        Body=json.dumps({"index": index_key, "entries": entries, "queued": int(time.time())},
+                        ensure_ascii=False).encode("utf-8"),
+        ContentType="application/json",
+        CacheControl="no-store",
+    )
+    log({"LEDGER": "index_pending", "index": index_key, "entries": len(entries), "ledger_key": lk})
+    return lk
+
+
+def replay_index_pending(bucket: str, lk: str) -> int:
+    """
+    Merges a parked folder-index update and deletes it. Entries are skipped when the bucket
+    has moved on since (meta for an original deleted meanwhile, a removal for one re-uploaded).
+    Returns how many entries were applied.
+    """
+    resp = s3.get_object(Bucket=bucket, Key=lk)
+    doc = json.loads(resp["Body"].read() or b"{}")
+    index_key = doc.get("index") or ""
+    entries = doc.get("entries") if isinstance(doc.get("entries"), dict) else {}
+
+    live = {k: v for k, v in entries.items() if (v is not None) == source_exists(bucket, k)}
+    if index_key and live:
+        update_folder_index(bucket, index_key, live)
+    s3.delete_object(Bucket=bucket, Key=lk)
+    log({"LEDGER": "index_replayed", "index": index_key, "entries": len(live), "stale": len(entries) - len(live)})
+    return len(live)
+
+
+def park_failed_indexes(failed: list, pending_index: dict) -> list:
+    # Returns the refs that could not be parked either (their messages must be redelivered)
+    return [ref for ref in failed if safe_ledger(record_index_pending, ref[0], ref[1], pending_index[ref]) is None]
+
+
+def safe_ledger(fn, *args):
+    # The ledger must never turn a handled record into a crashed invocation
+    if not FAILURE_LEDGER_ENABLED:
+        return None
+    try:
+        return fn(*args)
+    except Exception as e:
+        log({"ERROR": "LedgerWriteFailed", "msg": str(e), "op": fn.__name__})
+        return None
+
+
+def record_key(r: dict):
+    try:
+        return unquote_plus(r["s3"]["object"]["key"])
+    except Exception:
+        return None
+
+
+def record_bucket(r: dict):
+    try:
+        return r["s3"]["bucket"]["name"]
+    except Exception:
+        return None
+
+
+def process_removed(bucket: str, key: str, event_name: str, out: dict, pending_index: dict):
+    """
+    ObjectRemoved: deletes the original's thumbs, its folder-index entry and ledger entry.
+    Returns the (bucket, index_key) it queued a removal for, like process_record.
+    """
+    if not key.startswith(SOURCE_PREFIX) or key.endswith("/") or is_thumb_key(key):
+        out["skipped"] += 1
+        log({"SKIP": "removed_not_source", "key": key})
+        return None
+
+    # SQS does not keep order: a delete processed after a re-upload must not drop the new thumbs
+    if source_exists(bucket, key):
+        out["skipped"] += 1
+        log({"SKIP": "removed_but_exists_again", "key": key})
+        return None
+
+    # Only what a listing shows, so "removed" counts thumbs that existed, not every candidate name
+    deleted = delete_keys(bucket, existing_keys(bucket, rendition_keys_for(key)))
+    out["removed"] += deleted
+    safe_ledger(clear_failure, bucket, key)
+
+    index_ref = None
+    if FOLDER_INDEX_ENABLED:
+        index_ref = (bucket, folder_index_key_for(key))
+        pending_index.setdefault(index_ref, {})[key] = None
+
+    log({"OK": "thumbs_removed", "event": event_name, "key": key, "deleted": deleted})
+    return index_ref
+
+
+def process_record(r: dict, context, mode: str, out: dict, pending_index: dict,
+                   strategy: str = "default", track: dict | None = None):
+    """
+    Handles one S3 event record (ObjectCreated, or ObjectRemoved via process_removed). Raises on failure so the caller
+    can decide what to retry; skips and successes are counted in out.
+    strategy is one of STRATEGIES; track["phase"] holds the phase reached (for the ledger).
+    Returns the (bucket, index_key) whose pending folder-index entry it added, if any.
+    """
+    src_tmp = None
+    out_tmp = None
+    track = track if track is not None else {}
+    track["phase"] = "start"
+    key = None
+
+    def step(phase: str):
+        track["phase"] = phase
+        guard_time(context, phase, key)
+
+    try:
+        bucket = r["s3"]["bucket"]["name"]
+        key = unquote_plus(r["s3"]["object"]["key"])
+        event_name = r.get("eventName", "unknown")
+
+        if event_name.startswith("ObjectRemoved"):
+            track["phase"] = "remove"
+            return process_removed(bucket, key, event_name, out, pending_index)
+
+        # S3 event size is NOT always present/accurate (multipart/copy flows often give 0)
+        event_size = r["s3"]["object"].get("size", 0)
+        obj_size = int(event_size or 0)
+
+        # Multipart-safe: if size missing/0, fetch real size from HEAD
+        if obj_size <= 0:
+            obj_size = get_object_size_head(bucket, key)
+
+        log({
+            "EVENT": event_name,
+            "key": key,
+            "event_size": event_size,
+            "size_used": obj_size,
+            "strategy": strategy,
+        })
+
+        step("precheck")
+
+        if not key.startswith(SOURCE_PREFIX) or key.endswith("/") or is_thumb_key(key):
+            out["skipped"] += 1
+            log({"SKIP": "not_source_or_folder_or_thumb", "key": key})
+            return
+
+        kind = media_types.classify(key, MEDIA_EXT_TABLE)
+        img = kind == media_types.IMAGE
+        vid = kind == media_types.VIDEO
+        if not (img or vid):
+            out["skipped"] += 1
+            log({"SKIP": "not_image_or_video", "key": key})
+            return
+
+        # Small images still get decoded (cheaply) so the folder index has their metadata
+        make_thumb = True
+        if mode == "bytes" and not should_process_by_bytes(obj_size):
+            if vid or not FOLDER_INDEX_ENABLED:
                 out["skipped"] += 1
                 log({"SKIP": "bytes_gate", "key": key, "size": obj_size, "min_bytes": bytes_threshold()})
-                continue
+                return
+            make_thumb = False
 
-            if CREATE_THUMB_FOLDER_MARKER:
-                ensure_thumb_folder_marker(bucket, key)
+        if CREATE_THUMB_FOLDER_MARKER and make_thumb:
+            ensure_thumb_folder_marker(bucket, key)
 
-            out_tmp = f"/tmp/out-{uuid.uuid4().hex}"
+        out_tmp = f"/tmp/out-{uuid.uuid4().hex}"
 
-            if vid:
-                guard_time(context, "video_render", key)
-                log_capacity(context, "VIDEO_RENDER_BEFORE", {"key": key})
+        if vid:
+            step("video_render")
+            log_capacity(context, "VIDEO_RENDER_BEFORE", {"key": key})
 
-                thumb_key = thumb_key_for(key, ".jpg")
-                render_video_placeholder(out_tmp, THUMB_MAX_SIZE, label="VIDEO")
+            thumb_key = thumb_key_for(key, ".jpg")
+            render_video_placeholder(out_tmp, THUMB_MAX_SIZE, label="VIDEO")
 
-                guard_time(context, "video_upload", key)
-                log_capacity(context, "VIDEO_UPLOAD_BEFORE", {"key": key, "thumb": thumb_key})
+            step("video_upload")
+            log_capacity(context, "VIDEO_UPLOAD_BEFORE", {"key": key, "thumb": thumb_key})
 
-                s3.upload_file(
-                    out_tmp, bucket, thumb_key,
-                    ExtraArgs={"ContentType": "image/jpeg", "CacheControl": CACHE_CONTROL},
-                )
-                out["processed"] += 1
-                log({"OK": "video_thumb", "key": key, "thumb": thumb_key, "size": obj_size})
-                continue
+            s3.upload_file(
+                out_tmp, bucket, thumb_key,
+                ExtraArgs={"ContentType": "image/jpeg", "CacheControl": CACHE_CONTROL},
+            )
+            out["processed"] += 1
+            log({"OK": "video_thumb", "key": key, "thumb": thumb_key, "size": obj_size})
+            return
 
-            # Image path
-            src_tmp = f"/tmp/src-{uuid.uuid4().hex}"
+        # Last resort: a neutral placeholder still beats the gallery pulling the multi-MB original
+        if strategy == "placeholder":
+            if not make_thumb:
+                out["skipped"] += 1
+                log({"SKIP": "placeholder_not_needed_meta_only", "key": key, "size": obj_size})
+                return None
+            if real_thumb_exists(bucket, key):
+                out["skipped"] += 1
+                log({"SKIP": "placeholder_kept_real_thumb", "key": key})
+                return None
 
-            guard_time(context, "download", key)
-            log_capacity(context, "DOWNLOAD_BEFORE", {"key": key, "size": obj_size})
+            step("placeholder_render")
+            thumb_key = thumb_key_for(key, ".jpg")
+            render_video_placeholder(out_tmp, THUMB_MAX_SIZE, label="PHOTO", play_icon=False)
 
+            step("placeholder_upload")
+            s3.upload_file(
+                out_tmp, bucket, thumb_key,
+                ExtraArgs={"ContentType": "image/jpeg", "CacheControl": CACHE_CONTROL,
+                           "Metadata": {"placeholder": "true"}},
+            )
+            out["processed"] += 1
+            log({"OK": "placeholder_thumb", "key": key, "thumb": thumb_key, "size": obj_size})
+            return None
+
+        # Image path
+        use_tmp = strategy == "tmp" or obj_size > int(INMEM_MAX_MIB * 1024 * 1024)
+        draft_size = THUMB_MAX_SIZE if strategy == "default" else LOW_DRAFT_SIZE
+
+        step("download")
+        log_capacity(context, "DOWNLOAD_BEFORE", {"key": key, "size": obj_size, "via_tmp": use_tmp})
+
+        if use_tmp:
+            src_tmp = f"/tmp/src-{uuid.uuid4().hex}"
             s3.download_file(bucket, key, src_tmp)
+            src = src_tmp
+        else:
+            src = io.BytesIO(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+
+        step("decode")
+        log_capacity(context, "DECODE_BEFORE", {"key": key, "draft": draft_size})
+
+        with Image.open(src) as im:
+            # Original dimensions and EXIF come from the header, before draft() shrinks the decode
+            w, h = im.size
+            try:
+                exif = im.getexif()
+            except Exception:
+                exif = None
+            if exif is not None and exif.get(0x0112) in (5, 6, 7, 8):
+                w, h = h, w
+            max_dim = max(w, h)
+
+            # Hint decoder to reduce memory for JPEGs (best-effort)
+            try:
+                im.draft("RGB", (draft_size, draft_size))
+            except Exception:
+                pass
+
+            im = ImageOps.exif_transpose(im)
+
+            if mode == "pixels" and not should_process_by_pixels(max_dim):
+                if not FOLDER_INDEX_ENABLED:
+                    out["skipped"] += 1
+                    log({"SKIP": "pixels_gate", "key": key, "dims": [w, h], "min_px": THUMB_DECIDER_MIN_MAXDIM_PX})
+                    return
+                make_thumb = False
 
-            guard_time(context, "decode", key)
-            log_capacity(context, "DECODE_BEFORE", {"key": key})
+            step("resize")
+            log_capacity(context, "RESIZE_BEFORE", {"key": key, "dims": [w, h]})
 
-            with Image.open(src_tmp) as im:
-                # Hint decoder to reduce memory for JPEGs (best-effort)
+            im.thumbnail((THUMB_MAX_SIZE, THUMB_MAX_SIZE), Image.Resampling.LANCZOS)
+
+            index_ref = None
+            if FOLDER_INDEX_ENABLED:
+                step("meta")
+                index_ref = (bucket, folder_index_key_for(key))
+                pending_index.setdefault(index_ref, {})[key] = image_meta(im, w, h, exif)
+
+            if not make_thumb:
+                out["skipped"] += 1
+                log({"SKIP": "decider_gate_meta_only", "key": key, "mode": mode, "size": obj_size, "dims": [w, h]})
+                return index_ref
+
+            fmt, content_type, out_ext = choose_output_for_image(im)
+            thumb_key = thumb_key_for(key, out_ext)
+
+            step("save")
+            log_capacity(context, "SAVE_BEFORE", {"key": key, "out_fmt": fmt, "thumb": thumb_key})
+
+            # Encoded in memory: a thumb is tens of KiB, no /tmp round trip
+            quality, attempts = None, 1
+            if fmt == "JPEG":
+                if im.mode not in ("RGB", "L"):
+                    im = im.convert("RGB")
+                data, quality, attempts = encode_jpeg(im, context)
+            else:
+                data = _encode(im, fmt, optimize=True)
+
+            crop_key = crop_data = None
+            if CROP_THUMB_ENABLED:
+                step("crop")
+                crop_key = thumb_key_for(key, out_ext, CROP_THUMB_PREFIX)
+                crop = render_crop_thumb(im)
+                if fmt == "JPEG":
+                    crop_data = _encode(crop, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                else:
+                    crop_data = _encode(crop, fmt, optimize=True)
+
+        step("upload")
+        log_capacity(context, "UPLOAD_BEFORE", {"key": key, "thumb": thumb_key, "bytes": len(data)})
+
+        s3.put_object(
+            Bucket=bucket, Key=thumb_key, Body=data,
+            ContentType=content_type, CacheControl=CACHE_CONTROL,
+        )
+        if crop_data is not None:
+            s3.put_object(
+                Bucket=bucket, Key=crop_key, Body=crop_data,
+                ContentType=content_type, CacheControl=CACHE_CONTROL,
+            )
+            out["bytes_out"] += len(crop_data)
+
+        out["processed"] += 1
+        out["bytes_out"] += len(data)
+        out["encode_attempts"] += attempts
+        log({
+            "OK": "image_thumb", "key": key, "thumb": thumb_key, "size": obj_size, "strategy": strategy,
+            "bytes": len(data), "quality": quality, "attempts": attempts,
+            "target_bytes": JPEG_TARGET_BYTES or None,
+            "crop_thumb": crop_key, "crop_bytes": len(crop_data) if crop_data is not None else None,
+        })
+        return index_ref
+
+    finally:
+        # Clean up /tmp to avoid filling ephemeral storage
+        for p in (src_tmp, out_tmp):
+            if p and os.path.exists(p):
                 try:
-                    im.draft("RGB", (THUMB_MAX_SIZE, THUMB_MAX_SIZE))
+                    os.remove(p)
                 except Exception:
                     pass
 
-                im = ImageOps.exif_transpose(im)
-                w, h = im.size
-                max_dim = max(w, h)
 
-                if mode == "pixels" and not should_process_by_pixels(max_dim):
-                    out["skipped"] += 1
-                    log({"SKIP": "pixels_gate", "key": key, "dims": [w, h], "min_px": THUMB_DECIDER_MIN_MAXDIM_PX})
-                    continue
+def iter_work_items(event: dict):
+    """
+    Yields (message_id, prior_deliveries, s3_record). message_id is None for direct S3
+    invocations and the SQS messageId for queue-buffered events (S3 -> SQS -> Lambda);
+    prior_deliveries comes from ApproximateReceiveCount and only orders the batch
+    (the retry strategy comes from the ledger, see ledger_attempts).
+    """
+    for r in event.get("Records", []):
+        if r.get("eventSource") != "aws:sqs":
+            yield None, 0, r
+            continue
 
-                guard_time(context, "resize", key)
-                log_capacity(context, "RESIZE_BEFORE", {"key": key, "dims": [w, h]})
+        msg_id = r.get("messageId")
+        try:
+            body = json.loads(r.get("body") or "{}")
+        except ValueError:
+            log({"SKIP": "sqs_body_not_json", "message_id": msg_id})
+            continue
 
-                im.thumbnail((THUMB_MAX_SIZE, THUMB_MAX_SIZE), Image.Resampling.LANCZOS)
+        # S3 sends a one-off s3:TestEvent when the notification is (re)configured
+        if body.get("Event") == "s3:TestEvent":
+            log({"SKIP": "s3_test_event", "message_id": msg_id})
+            continue
 
-                fmt, content_type, out_ext = choose_output_for_image(im)
-                thumb_key = thumb_key_for(key, out_ext)
+        try:
+            prior = int((r.get("attributes") or {}).get("ApproximateReceiveCount", "1")) - 1
+        except ValueError:
+            prior = 0
+
+        for inner in body.get("Records", []):
+            yield msg_id, prior, inner
+
+
+def queue_url_from_arn(arn: str) -> str:
+    # arn:aws:sqs:<region>:<account>:<name> -> https://sqs.<region>.amazonaws.com/<account>/<name>
+    _, _, _, region, account, name = arn.split(":", 5)
+    return f"https://sqs.{region}.amazonaws.com/{account}/{name}"
+
+
+def release_messages(event: dict, msg_ids: set):
+    """
+    Sets visibility 0 on SQS messages handed back untouched (they still go in batchItemFailures,
+    so Lambda does not delete them). Best-effort: on error they reappear after the visibility timeout.
+    """
+    by_queue = {}
+    for r in event.get("Records", []):
+        if r.get("eventSource") == "aws:sqs" and r.get("messageId") in msg_ids:
+            try:
+                by_queue.setdefault(queue_url_from_arn(r["eventSourceARN"]), []).append(r["receiptHandle"])
+            except (KeyError, ValueError):
+                continue
 
-                save_kwargs = {"optimize": True}
-                if fmt == "JPEG":
-                    if im.mode not in ("RGB", "L"):
-                        im = im.convert("RGB")
-                    save_kwargs.update({"quality": JPEG_QUALITY, "progressive": True})
+    sqs = aws_clients.client("sqs")
+    for url, handles in by_queue.items():
+        for i in range(0, len(handles), 10):
+            entries = [{"Id": str(n), "ReceiptHandle": h, "VisibilityTimeout": 0}
+                       for n, h in enumerate(handles[i:i + 10])]
+            try:
+                resp = sqs.change_message_visibility_batch(QueueUrl=url, Entries=entries)
+                for f in resp.get("Failed", []):
+                    log({"ERROR": "ReleaseFailed", "queue": url, "code": f.get("Code"), "msg": f.get("Message")})
+            except Exception as e:
+                log({"ERROR": "ReleaseFailed", "queue": url, "msg": str(e)})
+    log({"SCHED": "released", "messages": len(msg_ids)})
+
+
+def iter_ledger_keys(bucket: str):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=FAILURE_LEDGER_PREFIX):
+        for obj in page.get("Contents", []):
+            k = obj.get("Key", "")
+            if k.endswith(".json"):
+                yield k
+
+
+def retry_failures(event, context):
+    """
+    Retry driver (scheduled): reprocesses ledger entries with the strategy matching
+    their attempt count (default -> low_draft -> tmp -> placeholder) and clears them on success.
+    Invoked with {"action": "retry_failures", "bucket": "<gallery bucket>"}.
+    """
+    bucket = (event.get("bucket") or "").strip()
+    out = {"processed": 0, "skipped": 0, "indexed": 0, "errors": 0, "cleared": 0, "bytes_out": 0, "encode_attempts": 0, "removed": 0}
+    pending_index = {}
+
+    if not bucket:
+        log({"ERROR": "retry_failures_missing_bucket"})
+        return {"ok": False, **out}
 
-                guard_time(context, "save", key)
-                log_capacity(context, "SAVE_BEFORE", {"key": key, "out_fmt": fmt, "thumb": thumb_key})
+    mode = THUMB_DECIDER_MODE if THUMB_DECIDER_MODE in ("bytes", "pixels") else "bytes"
+    log_capacity(context, "RETRY_START", {"bucket": bucket})
 
-                im.save(out_tmp, format=fmt, **save_kwargs)
+    tried = 0
+    for lk in iter_ledger_keys(bucket):
+        if tried >= RETRY_MAX_PER_RUN:
+            break
 
-            guard_time(context, "upload", key)
-            log_capacity(context, "UPLOAD_BEFORE", {"key": key, "thumb": thumb_key})
+        key = lk[len(FAILURE_LEDGER_PREFIX):-len(".json")]
+        try:
+            guard_time(context, "retry_next", key)
+        except SoftTimeout:
+            break
+
+        if lk.startswith(INDEX_PENDING_PREFIX):
+            tried += 1
+            try:
+                out["indexed"] += replay_index_pending(bucket, lk)
+                out["cleared"] += 1
+            except Exception as e:
+                # Stays parked for the next run
+                out["errors"] += 1
+                log({"ERROR": type(e).__name__, "msg": str(e), "ledger_key": lk, "trace": traceback.format_exc()})
+            continue
+
+        entry = read_failure(bucket, key) or {}
+        attempts = int(entry.get("attempts", 0) or 0) if entry.get("settings_hash") == SETTINGS_HASH else 0
+        if attempts >= RETRY_MAX_ATTEMPTS:
+            out["skipped"] += 1
+            log({"SKIP": "retry_gave_up", "key": key, "attempts": attempts})
+            continue
+
+        tried += 1
+        strategy = strategy_for_attempt(attempts)
+        r = {
+            "eventName": "RetryDriver",
+            "s3": {"bucket": {"name": bucket}, "object": {"key": quote_plus(key, safe="/")}},
+        }
+        track = {}
 
-            s3.upload_file(
-                out_tmp, bucket, thumb_key,
-                ExtraArgs={"ContentType": content_type, "CacheControl": CACHE_CONTROL},
-            )
+        try:
+            process_record(r, context, mode, out, pending_index, strategy, track)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code", "")
+            if code in ("404", "NoSuchKey", "NotFound"):
+                # Original was deleted/renamed: nothing left to thumbnail
+                safe_ledger(clear_failure, bucket, key)
+                out["cleared"] += 1
+                continue
+            out["errors"] += 1
+            safe_ledger(record_failure, bucket, key, track.get("phase", "unknown"), e, strategy)
+        except SoftTimeout as e:
+            out["errors"] += 1
+            safe_ledger(record_failure, bucket, key, track.get("phase", "unknown"), e, strategy)
+            break
+        except Exception as e:
+            out["errors"] += 1
+            log({"ERROR": type(e).__name__, "msg": str(e), "key": key, "strategy": strategy, "trace": traceback.format_exc()})
+            safe_ledger(record_failure, bucket, key, track.get("phase", "unknown"), e, strategy)
+        else:
+            safe_ledger(clear_failure, bucket, key)
+            out["cleared"] += 1
+
+    if pending_index:
+        park_failed_indexes(flush_folder_indexes(pending_index, out), pending_index)
+
+    log_capacity(context, "RETRY_END", {**out, "tried": tried})
+    return {"ok": out["errors"] == 0, **out}
+
+
+def iter_objects(bucket: str, prefix: str):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj.get("Key", "")
+
+
+def sweep_orphans(event, context):
+    """
+    Orphan sweeper (manual/scheduled): removes thumbs (and crop renditions) whose original no longer exists.
+    Invoked with {"action": "sweep_orphans", "bucket": "<gallery bucket>",
+                  "prefix": "<album/>" (optional, default everything), "dry_run": false}.
+    Thumbs and folder markers/indexes of albums without any originals are deleted in
+    1,000-key DeleteObjects chunks; indexes of live albums drop entries of deleted originals.
+    """
+    bucket = (event.get("bucket") or "").strip()
+    prefix = (event.get("prefix") or "").strip().lstrip("/")
+    dry_run = bool(event.get("dry_run"))
+    out = {"orphans": 0, "deleted": 0, "indexes_pruned": 0, "errors": 0}
+
+    if not bucket:
+        log({"ERROR": "sweep_orphans_missing_bucket"})
+        return {"ok": False, **out}
+
+    log_capacity(context, "SWEEP_START", {"bucket": bucket, "prefix": prefix, "dry_run": dry_run})
+
+    sources = set()
+    expected = set()
+    live_dirs = set()
+    for k in iter_objects(bucket, SOURCE_PREFIX + prefix):
+        if k.endswith("/"):
+            continue
+        sources.add(k)
+        expected.update(rendition_keys_for(k))
+        live_dirs.add(thumb_dir_for(k))
+
+    orphans = []
+    index_keys = []
+    for k in iter_objects(bucket, THUMB_ROOT_PREFIX + prefix):
+        d, base = posixpath.split(k)
+        d += "/"
+        if k == THUMB_ROOT_PREFIX:
+            continue
+        if k.endswith("/") or base == FOLDER_INDEX_NAME:
+            # Folder marker / index of an album with no originals left
+            if d not in live_dirs:
+                orphans.append(k)
+            elif base == FOLDER_INDEX_NAME:
+                index_keys.append(k)
+        elif base.startswith((THUMB_PREFIX, CROP_THUMB_PREFIX)) and k not in expected:
+            orphans.append(k)
+
+    out["orphans"] = len(orphans)
+    log({"SWEEP": "orphans_found", "count": len(orphans), "sample": orphans[:20]})
+
+    if not dry_run:
+        try:
+            for i in range(0, len(orphans), 1000):
+                guard_time(context, "sweep_delete", orphans[i])
+                out["deleted"] += delete_keys(bucket, orphans[i:i + 1000])
+
+            for ik in index_keys:
+                guard_time(context, "sweep_index", ik)
+                doc, _ = _read_folder_index(bucket, ik)
+                images = doc.get("images") if isinstance(doc.get("images"), dict) else {}
+                gone = {k: None for k in images if k not in sources}
+                if gone:
+                    update_folder_index(bucket, ik, gone)
+                    out["indexes_pruned"] += 1
+        except SoftTimeout:
+            # Re-run to finish; everything deleted so far stays deleted
+            out["errors"] += 1
 
-            out["processed"] += 1
-            log({"OK": "image_thumb", "key": key, "thumb": thumb_key, "size": obj_size})
+    log_capacity(context, "SWEEP_END", out)
+    return {"ok": out["errors"] == 0, "dry_run": dry_run, **out}
+
+
+def lambda_handler(event, context):
+    if event.get("action") == "retry_failures":
+        return retry_failures(event, context)
+    if event.get("action") == "sweep_orphans":
+        return sweep_orphans(event, context)
+
+    work = list(iter_work_items(event))
+    out = {"processed": 0, "skipped": 0, "indexed": 0, "errors": 0, "bytes_out": 0, "encode_attempts": 0, "removed": 0,
+           "deferred": 0}
+    pending_index = {}
+    index_msgs = {}
+    failed_msgs = set()
+    deferred_msgs = set()
+    timed_out = False
+
+    mode = THUMB_DECIDER_MODE if THUMB_DECIDER_MODE in ("bytes", "pixels") else "bytes"
+
+    log_capacity(context, "START", {"records": len(work), "mode": mode})
+
+    try:
+        mem_limit = float(getattr(context, "memory_limit_in_mb", 0) or 0)
+    except (TypeError, ValueError):
+        mem_limit = 0.0
+    budget_mb = SCHED_MEM_FRACTION * mem_limit if mem_limit > 0 else float("inf")
+    started = 0
+
+    items = plan_batch(work, mode, budget_mb)
+
+    for item in items:
+        msg_id, r = item["msg_id"], item["r"]
+        key = record_key(r)
+        bucket = record_bucket(r)
+
+        # After a soft timeout nothing else fits; hand the rest back to the queue (or the ledger) untouched
+        if timed_out:
+            out["errors"] += 1
+            log({"ERROR": "SoftTimeout", "msg": "deferred_after_soft_timeout", "key": key, "message_id": msg_id})
+            hand_back(item, "not_started", SoftTimeout("deferred_after_soft_timeout"), deferred_msgs)
+            continue
+
+        strategy = item["strategy"]
+        track = {}
+        err = None
+
+        if SCHED_ENABLED:
+            strategy = admit(item, budget_mb, started)
+            if strategy is None:
+                # Predicted not to fit next to what already ran: hand it to a fresh invocation
+                out["deferred"] += 1
+                hand_back(item, "schedule", MemoryBudgetDeferred(f"deferred at {round(get_rss_mb(), 1)}MB rss"),
+                          deferred_msgs)
+                continue
+        started += 1
+
+        try:
+            index_ref = process_record(r, context, mode, out, pending_index, strategy, track)
+            if msg_id and index_ref:
+                index_msgs.setdefault(index_ref, set()).add(msg_id)
 
         except SoftTimeout as e:
+            err = e
             out["errors"] += 1
-            log({"ERROR": "SoftTimeout", "msg": str(e), "key": key if "key" in locals() else None})
+            timed_out = True
+            log({"ERROR": "SoftTimeout", "msg": str(e), "key": key, "message_id": msg_id})
         except MemoryError as e:
+            err = e
             out["errors"] += 1
-            log_capacity(context, "MEMORY_ERROR", {"key": key if "key" in locals() else None})
-            log({"ERROR": "MemoryError", "msg": str(e), "trace": traceback.format_exc()})
+            log_capacity(context, "MEMORY_ERROR", {"key": key})
+            log({"ERROR": "MemoryError", "msg": str(e), "key": key, "trace": traceback.format_exc()})
         except Exception as e:
+            err = e
             out["errors"] += 1
-            log({"ERROR": type(e).__name__, "msg": str(e), "trace": traceback.format_exc()})
-        finally:
-            # Clean up /tmp to avoid filling ephemeral storage
-            for p in (src_tmp, out_tmp):
-                if p and os.path.exists(p):
-                    try:
-                        os.remove(p)
-                    except Exception:
-                        pass
-
-    log_capacity(context, "END", out)
-    return {"ok": out["errors"] == 0, **out}
\ No newline at end of file
+            log({"ERROR": type(e).__name__, "msg": str(e), "key": key, "trace": traceback.format_exc()})
+
+        if err is None:
+            # Any success clears an existing entry (redelivery, re-upload, coverage fill), else the
+            # retry driver would reprocess a good thumb at its escalated strategy
+            if item["ledgered"] and bucket and key:
+                safe_ledger(clear_failure, bucket, key)
+            continue
+
+        entry = None
+        if bucket and key:
+            entry = safe_ledger(record_failure, bucket, key, track.get("phase", "unknown"), err, strategy)
+        if msg_id and entry is None:
+            # One retry channel per failure: once ledgered, the message is acked and the retry
+            # driver owns it (escalating per attempt). Redelivery is only the fallback when no
+            # entry could be written, so the two never retry (and escalate) the same record.
+            failed_msgs.add(msg_id)
+
+    if pending_index:
+        # Thumbs are already written: a conflicting index write is parked in the ledger for the
+        # retry driver instead of redelivering (and re-decoding) every message that fed it
+        for ik in park_failed_indexes(flush_folder_indexes(pending_index, out), pending_index):
+            failed_msgs.update(index_msgs.get(ik, ()))
+
+    # Deferred/unstarted messages never ran: make them visible again now instead of after the
+    # visibility timeout (messages that also really failed keep the timeout as backoff)
+    if deferred_msgs - failed_msgs:
+        release_messages(event, deferred_msgs - failed_msgs)
+    failed_msgs |= deferred_msgs
+
+    log_capacity(context, "END", {**out, "failed_messages": len(failed_msgs)})
+
+    resp = {"ok": out["errors"] == 0, **out}
+    if any(r.get("eventSource") == "aws:sqs" for r in event.get("Records", [])):
+        # Partial batch response: only these messages become visible again on the queue
+        resp["batchItemFailures"] = [{"itemIdentifier": m} for m in sorted(failed_msgs)]
+    return resp
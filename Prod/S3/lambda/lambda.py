@@ -4,14 +4,16 @@ import time
 import base64
 import re
 import secrets
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Optional, Tuple, List
-from urllib.parse import quote
+from urllib.parse import quote, quote_plus
 
-import boto3
 from botocore.exceptions import ClientError
 
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import padding
+import aws_clients
+import cf_signer
+import media_types
 
 
 # =============================================================================
@@ -19,7 +21,10 @@ from cryptography.hazmat.primitives.asymmetric import padding
 # =============================================================================
 CLOUDFRONT_DOMAIN = os.environ["CLOUDFRONT_DOMAIN"].strip()
 CLOUDFRONT_KEY_PAIR_ID = os.environ["CLOUDFRONT_KEY_PAIR_ID"].strip()
-PRIVATE_KEY_SECRET_ARN = os.environ["CLOUDFRONT_PRIVATE_KEY_SECRET_ARN"].strip()
+PRIVATE_KEY_SECRET_ARN = os.getenv("CLOUDFRONT_PRIVATE_KEY_SECRET_ARN", "").strip()
+PRIVATE_KEY_FILE = os.getenv("CLOUDFRONT_PRIVATE_KEY_FILE", "").strip()
+if not (PRIVATE_KEY_SECRET_ARN or PRIVATE_KEY_FILE):
+    raise RuntimeError("CLOUDFRONT_PRIVATE_KEY_SECRET_ARN or CLOUDFRONT_PRIVATE_KEY_FILE must be set")
 GALLERY_BUCKET = os.environ["GALLERY_BUCKET"].strip()
 DDB_TABLE_NAME = os.environ["DDB_TABLE_NAME"].strip()
 
@@ -30,6 +35,7 @@ if not ALLOWED_PREFIX_RAW:
 # Prefixes (must end with "/")
 BASE_PREFIX = ALLOWED_PREFIX_RAW.strip().strip("/") + "/"              # e.g. "gallery/"
 THUMBS_PREFIX = os.getenv("THUMBS_PREFIX", "thumbs/").strip().strip("/") + "/"  # e.g. "thumbs/"
+THUMB_FILE_PREFIX = os.getenv("THUMB_FILE_PREFIX", "thumb-of-")                 # must match the thumb Lambda's THUMB_PREFIX
 
 DEFAULT_TTL_SECONDS = int(os.getenv("DEFAULT_TTL_SECONDS", "86400"))
 MAX_TTL_SECONDS = int(os.getenv("MAX_TTL_SECONDS", "86400"))
@@ -46,20 +52,45 @@ LIST_PATH = os.getenv("LIST_PATH", "/list").strip()
 SIGN_PATH = os.getenv("SIGN_PATH", "/sign").strip()
 REVOKE_PATH = os.getenv("REVOKE_PATH", "/revoke").strip()
 ADMIN_LINKS_PATH = os.getenv("ADMIN_LINKS_PATH", "/admin/links").strip()
+ADMIN_UPLOAD_PATH = os.getenv("ADMIN_UPLOAD_PATH", "/admin/upload").strip()
+ADMIN_COVERAGE_PATH = os.getenv("ADMIN_COVERAGE_PATH", "/admin/coverage").strip()
 
 MAX_LIST_KEYS = int(os.getenv("MAX_LIST_KEYS", "500"))
 
-ALLOWED_IMAGE_EXT = set(
-    e.strip().lower()
-    for e in os.getenv("ALLOWED_IMAGE_EXT", ".jpg,.jpeg,.png,.webp,.gif").split(",")
-    if e.strip()
-)
+# /list?sort=key (S3 key order, default) | captured (EXIF capture time from the folder index)
+LIST_SORTS = ("key", "captured")
 
-ALLOWED_ZIP_EXT = set(
-    e.strip().lower()
-    for e in os.getenv("ALLOWED_ZIP_EXT", ".zip").split(",")
-    if e.strip()
-)
+# Admin multipart upload of originals (browser PUTs parts straight to S3 via presigned URLs)
+UPLOAD_PART_MIB = int(os.getenv("UPLOAD_PART_MIB", "16"))                  # S3 minimum is 5 MiB
+UPLOAD_MAX_PARTS = int(os.getenv("UPLOAD_MAX_PARTS", "2000"))              # S3 max is 10000; keeps "complete" bodies small
+S3_MAX_OBJECT_BYTES = 5 * 1024 ** 4                                         # S3 limits: 5 TiB per object,
+S3_MAX_PART_BYTES = 5 * 1024 ** 3                                           # 5 GiB per part,
+S3_MAX_PARTS = 10000                                                        # 10000 parts
+UPLOAD_PRESIGN_BATCH = int(os.getenv("UPLOAD_PRESIGN_BATCH", "100"))       # part URLs per "parts" call
+UPLOAD_URL_TTL_SECONDS = int(os.getenv("UPLOAD_URL_TTL_SECONDS", "3600"))
+
+# Thumbnail coverage report (/admin/coverage)
+THUMB_QUEUE_URL = os.getenv("THUMB_QUEUE_URL", "").strip()                   # gap filling enqueues here
+THUMB_DECIDER_MIN_MIB = float(os.getenv("THUMB_DECIDER_MIN_MIB", "0"))      # same gate as the thumb Lambda
+COVERAGE_MAX_ITEMS = int(os.getenv("COVERAGE_MAX_ITEMS", "500"))            # keys returned per category
+COVERAGE_MAX_ENQUEUE = int(os.getenv("COVERAGE_MAX_ENQUEUE", "2000"))       # gaps enqueued per call
+
+# Request bodies above this (decoded) size are rejected with 413 before any decoding/parsing
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(256 * 1024)))
+
+# Folders larger than one list page are split into StartAfter key ranges listed concurrently
+LIST_PARALLEL_SHARDS = int(os.getenv("LIST_PARALLEL_SHARDS", "8"))
+LIST_SHARD_PROBES = max(4, int(os.getenv("LIST_SHARD_PROBES", "32")))   # MaxKeys=1 probes locating split keys
+
+# Per-folder image metadata written by the thumb Lambda: thumbs/<folder>/_index.json
+FOLDER_INDEX_NAME = os.getenv("FOLDER_INDEX_NAME", "_index.json").strip().strip("/") or "_index.json"
+
+ALLOWED_IMAGE_EXT = media_types.parse_exts(os.getenv("ALLOWED_IMAGE_EXT", media_types.DEFAULT_IMAGE_EXTS))
+ALLOWED_VIDEO_EXT = media_types.parse_exts(os.getenv("ALLOWED_VIDEO_EXT", media_types.DEFAULT_VIDEO_EXTS))
+ALLOWED_ZIP_EXT = media_types.parse_exts(os.getenv("ALLOWED_ZIP_EXT", media_types.DEFAULT_ZIP_EXTS))
+
+# ext -> "image" | "video" | "zip" (single lookup per listed key)
+MEDIA_EXT_TABLE = media_types.build_ext_table(ALLOWED_IMAGE_EXT, ALLOWED_VIDEO_EXT, ALLOWED_ZIP_EXT)
 
 # Cookie attributes
 COOKIE_SECURE = os.getenv("COOKIE_SECURE", "true").lower() == "true"
@@ -76,13 +107,26 @@ INCLUDE_TOKEN_IN_REDIRECT = os.getenv("INCLUDE_TOKEN_IN_REDIRECT", "true").lower
 # =============================================================================
 # AWS clients
 # =============================================================================
-_sm = boto3.client("secretsmanager")
-_s3 = boto3.client("s3")
-
-_ddb = boto3.resource("dynamodb")
+# Shared factory: sized pool (parallel listing shards), adaptive retries, timeouts, keepalive
+_sm = aws_clients.client("secretsmanager")
+# Peak: LIST_PARALLEL_SHARDS ranges each probing LIST_SHARD_PROBES/2 split points at once
+_s3 = aws_clients.client("s3", max_pool_connections=max(aws_clients.BOTO_MAX_POOL_CONNECTIONS,
+                                                       LIST_PARALLEL_SHARDS * max(2, LIST_SHARD_PROBES // 2),
+                                                       LIST_SHARD_PROBES + 1))
+_s3_presign = aws_clients.s3_presign_client()
+_sqs = aws_clients.client("sqs")
+
+_ddb = aws_clients.resource("dynamodb")
 _table = _ddb.Table(DDB_TABLE_NAME)
 
-_private_key_obj = None
+# Private key is loaded here, during init, instead of on the first /open.
+# CLOUDFRONT_PRIVATE_KEY_FILE (local/offline runs) takes precedence over the secret.
+if PRIVATE_KEY_FILE:
+    _key_source = cf_signer.FileKeySource(PRIVATE_KEY_FILE)
+else:
+    _key_source = cf_signer.SecretsManagerKeySource(_sm, PRIVATE_KEY_SECRET_ARN)
+_signer = cf_signer.Signer(_key_source, CLOUDFRONT_KEY_PAIR_ID)
+_signer.preload()
 
 
 # =============================================================================
@@ -117,25 +161,6 @@ def _cloudfront_url_safe_b64(data: bytes) -> str:
     return s.replace("+", "-").replace("=", "_").replace("/", "~")
 
 
-def _load_private_key() -> Any:
-    global _private_key_obj
-    if _private_key_obj is not None:
-        return _private_key_obj
-
-    try:
-        resp = _sm.get_secret_value(SecretId=PRIVATE_KEY_SECRET_ARN)
-    except ClientError as e:
-        raise RuntimeError(f"Failed to read secret {PRIVATE_KEY_SECRET_ARN}: {e}") from e
-
-    pem = resp.get("SecretString")
-    if not pem:
-        pem = base64.b64decode(resp["SecretBinary"]).decode("utf-8")
-
-    key = serialization.load_pem_private_key(pem.encode("utf-8"), password=None)
-    _private_key_obj = key
-    return key
-
-
 def _build_custom_policy_for_folder(folder: str, expires_epoch: int) -> str:
     """
     folder is normalized like "Client Name/Job 123/" (may contain spaces).
@@ -166,26 +191,82 @@ def _build_custom_policy_for_folder(folder: str, expires_epoch: int) -> str:
  
 
 
-def _sign_policy(policy_str: str) -> Tuple[str, str]:
-    key = _load_private_key()
+def _sign_policy(policy_str: str) -> Tuple[str, str, str]:
     policy_bytes = policy_str.encode("utf-8")
-    signature = key.sign(policy_bytes, padding.PKCS1v15(), hashes.SHA1())  # CloudFront requires RSA-SHA1 here
-    return _cloudfront_url_safe_b64(policy_bytes), _cloudfront_url_safe_b64(signature)
+    signature, key_pair_id = _signer.sign(policy_bytes)
+    return _cloudfront_url_safe_b64(policy_bytes), _cloudfront_url_safe_b64(signature), key_pair_id
 
 
 # =============================================================================
 # Helpers: parsing / validation
 # =============================================================================
+class RequestTooLarge(ValueError):
+    pass
+
+
+class _Request:
+    """
+    Per-event view of the API Gateway request.
+    The body is size-checked up front and decoded/parsed at most once (lazily, on first .body access).
+    """
+
+    __slots__ = ("event", "query", "multi_query", "headers", "cookies", "_body")
+
+    def __init__(self, event: Dict[str, Any]) -> None:
+        self.event = event
+        self.query: Dict[str, str] = event.get("queryStringParameters") or {}
+        self.multi_query: Dict[str, List[str]] = event.get("multiValueQueryStringParameters") or {}
+        self.headers: Dict[str, str] = {str(k).lower(): v for k, v in (event.get("headers") or {}).items()}
+        self.cookies = _parse_cookies(event, self.headers)
+        self._body: Optional[Dict[str, Any]] = None
+
+        raw = event.get("body") or ""
+        size = len(raw)
+        if event.get("isBase64Encoded"):
+            size = (size * 3) // 4  # decoded size, without decoding
+        if size > MAX_BODY_BYTES:
+            raise RequestTooLarge("payload_too_large")
+
+    @property
+    def body(self) -> Dict[str, Any]:
+        if self._body is None:
+            self._body = _parse_json_body(self.event)
+        return self._body
+
+    def param(self, name: str) -> Optional[str]:
+        # Query string first (single, then multi-value), no body fallback
+        v = self.query.get(name)
+        if v is None:
+            mv = self.multi_query.get(name)
+            if mv:
+                v = mv[0]
+        return v
+
+
+def _parse_cookies(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, str]:
+    # v2 payload: event["cookies"] = ["a=1", ...]; v1: "Cookie: a=1; b=2" header
+    parts = event.get("cookies")
+    if parts is None:
+        parts = (headers.get("cookie") or "").split(";")
+    out: Dict[str, str] = {}
+    for c in parts:
+        k, sep, v = c.strip().partition("=")
+        if sep and k:
+            out.setdefault(k, v)
+    return out
+
+
 def _parse_json_body(event: Dict[str, Any]) -> Dict[str, Any]:
     body = event.get("body")
     if not body:
         return {}
     try:
         if event.get("isBase64Encoded"):
-            body = base64.b64decode(body).decode("utf-8")
-        return json.loads(body)
+            body = base64.b64decode(body)  # json.loads accepts the UTF-8 bytes directly
+        payload = json.loads(body)
     except Exception:
         return {}
+    return payload if isinstance(payload, dict) else {}
 
 
 def _normalize_folder(folder: str) -> str:
@@ -216,23 +297,19 @@ def _normalize_folder(folder: str) -> str:
     return f"{s}/"
 
 
-def _parse_folder_from_admin_request(event: Dict[str, Any]) -> str:
-    q = event.get("queryStringParameters") or {}
-    folder = q.get("folder")
-    payload = _parse_json_body(event)
+def _parse_folder_from_admin_request(req: _Request) -> str:
+    folder = req.query.get("folder")
     if folder is None:
-        folder = payload.get("folder") or payload.get("path")
+        folder = req.body.get("folder") or req.body.get("path")
     if folder is None:
         raise ValueError("folder_required")
     return _normalize_folder(folder)
 
 
-def _parse_link_ttl_seconds_from_admin_request(event: Dict[str, Any]) -> int:
-    q = event.get("queryStringParameters") or {}
-    link_ttl = q.get("link_ttl_seconds")
-    payload = _parse_json_body(event)
+def _parse_link_ttl_seconds_from_admin_request(req: _Request) -> int:
+    link_ttl = req.query.get("link_ttl_seconds")
     if link_ttl is None:
-        link_ttl = payload.get("link_ttl_seconds")
+        link_ttl = req.body.get("link_ttl_seconds")
 
     link_ttl_seconds = DEFAULT_LINK_TTL_SECONDS if link_ttl is None else int(link_ttl)
     if link_ttl_seconds < 60:
@@ -240,18 +317,11 @@ def _parse_link_ttl_seconds_from_admin_request(event: Dict[str, Any]) -> int:
     return link_ttl_seconds
 
 
-def _parse_token(event: Dict[str, Any]) -> Optional[str]:
-    q = event.get("queryStringParameters") or {}
-    token = q.get("t")
-
-    if not token:
-        mv = event.get("multiValueQueryStringParameters") or {}
-        tlist = mv.get("t")
-        if tlist:
-            token = tlist[0]
+def _parse_token(req: _Request) -> Optional[str]:
+    token = req.param("t")
 
     if not token:
-        payload = _parse_json_body(event)
+        payload = req.body
         token = payload.get("token") or payload.get("t") or payload.get("link_token")
 
     token = (token or "").strip()
@@ -337,51 +407,519 @@ def _redirect_error(http_code: int, reason: str) -> Dict[str, Any]:
 # =============================================================================
 # Helpers: S3 listing
 # =============================================================================
-def _is_allowed_image_key(key: str) -> bool:
-    lk = key.lower()
-    return any(lk.endswith(ext) for ext in ALLOWED_IMAGE_EXT)
+def _load_folder_index(folder: str) -> Dict[str, Any]:
+    """
+    Returns {original_key: {"w","h","orientation","color","blurhash", "taken","camera",...}} for the folder
+    (empty when the thumb Lambda has not written an index yet).
+    """
+    index_key = THUMBS_PREFIX + folder + FOLDER_INDEX_NAME
+    try:
+        resp = _s3.get_object(Bucket=GALLERY_BUCKET, Key=index_key)
+        doc = json.loads(resp["Body"].read() or b"{}")
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code", "")
+        if code not in ("404", "NoSuchKey", "NotFound", "AccessDenied"):
+            print("FOLDER_INDEX_READ_FAILED:", index_key, code)
+        return {}
+    except ValueError:
+        print("FOLDER_INDEX_INVALID_JSON:", index_key)
+        return {}
+
+    images = doc.get("images") if isinstance(doc, dict) else None
+    return images if isinstance(images, dict) else {}
+
+
+# Key characters in S3 (UTF-8 byte) order, grouped into classes used to pick shard boundaries
+_SHARD_CHAR_CLASSES = (
+    " -.",
+    "0123456789",
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    "_",
+    "abcdefghijklmnopqrstuvwxyz",
+)
+
+
+def _list_page(prefix: str, start_after: Optional[str], stop_at: Optional[str],
+               token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One list page of keys k under prefix with start_after < k <= stop_at (stop_at=None -> to
+    the end). Returns (objs, continuation token or None when the range is exhausted).
+    """
+    args: Dict[str, Any] = {"Bucket": GALLERY_BUCKET, "Prefix": prefix, "MaxKeys": 1000}
+    if token:
+        args["ContinuationToken"] = token
+    elif start_after:
+        args["StartAfter"] = start_after
+
+    resp = _s3.list_objects_v2(**args)
+
+    objs: List[Dict[str, Any]] = []
+    for obj in resp.get("Contents", []):
+        if stop_at is not None and obj.get("Key", "") > stop_at:
+            return objs, None
+        objs.append(obj)
+    return objs, (resp.get("NextContinuationToken") if resp.get("IsTruncated") else None)
+
+
+def _list_range(prefix: str, start_after: Optional[str], stop_at: Optional[str],
+                token: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Lists keys k under prefix with start_after < k <= stop_at (stop_at=None -> to the end).
+    """
+    objs: List[Dict[str, Any]] = []
+    while True:
+        page, token = _list_page(prefix, start_after, stop_at, token)
+        objs.extend(page)
+        if not token:
+            return objs
+
+
+def _evenly(items: List[str], n: int) -> List[str]:
+    """At most n items, spread evenly over the list and keeping its first."""
+    if len(items) <= n:
+        return items
+    step = len(items) / float(n)
+    return [items[int(i * step)] for i in range(n)]
+
+
+def _shard_candidates(prefix: str, page_keys: List[str], limit: int) -> List[str]:
+    """
+    Split-key guesses past a page, at each character position from one past the first where
+    the page's keys differ back to the start: "PXL_20240610_..." yields PXL_2024061[1-9],
+    PXL_202406[2-9], PXL_202407, PXL_202408..., PXL_2025..., Q... so later days, months and
+    other name stems each get guesses. The limit is shared round-robin across positions.
+    """
+    last = page_keys[-1][len(prefix):]
+    first = page_keys[0][len(prefix):]
+    q = min(len(os.path.commonprefix([first, last])) + 1, len(last) - 1)
+
+    per_position: List[List[str]] = []
+    for i in range(q, -1, -1):
+        ch = last[i]
+        at_i: List[str] = []
+        for cls in _SHARD_CHAR_CLASSES:
+            if ch in cls:
+                # A letter position would otherwise take most of the budget on its own
+                at_i.extend(_evenly([c for c in cls if c > ch], 9))
+            elif cls[0] > ch:
+                at_i.append(cls[0])
+        if at_i:
+            per_position.append(_evenly([prefix + last[:i] + c for c in at_i], len(at_i)))
+
+    candidates: List[str] = []
+    for n in range(max((len(p) for p in per_position), default=0)):
+        candidates.extend(p[n] for p in per_position if n < len(p))
+    return candidates[:limit]
+
+
+def _shard_ranges(prefix: str, page_keys: List[str], stop_at: Optional[str],
+                  shards: int, probes: int) -> List[Tuple[str, Optional[str]]]:
+    """
+    Splits (last page key, stop_at] into at most shards (start_after, stop_at) ranges.
+
+    The page end and each guess from _shard_candidates are probed (MaxKeys=1, in parallel)
+    for the first real key after them. A point is kept only if a key follows it before the
+    next point, so every range holds at least one key (and the stretch before the first kept
+    point holds none, so it is skipped). With
+    more such points than shards the coarsest (shortest) win: a month boundary bounds more
+    keys than a day boundary. [] when the probes cannot find 2 non-empty ranges (list
+    sequentially instead).
+    """
+    def probe(c: str) -> Optional[str]:
+        resp = _s3.list_objects_v2(Bucket=GALLERY_BUCKET, Prefix=prefix, StartAfter=c, MaxKeys=1)
+        contents = resp.get("Contents", [])
+        k = contents[0].get("Key") if contents else None
+        return k if k is not None and (stop_at is None or k <= stop_at) else None
+
+    start = page_keys[-1]
+    points = sorted({start} | {c for c in _shard_candidates(prefix, page_keys, probes)
+                               if c > start and (stop_at is None or c < stop_at)})
+    with ThreadPoolExecutor(max_workers=len(points)) as pool:
+        nexts = list(pool.map(probe, points))
+
+    useful = [p for i, p in enumerate(points)
+              if nexts[i] is not None and (i + 1 == len(points) or nexts[i] <= points[i + 1])]
+    if len(useful) < 2:
+        return []
+
+    useful = useful[:1] + sorted(sorted(useful[1:], key=len)[:shards - 1])
+    stops: List[Optional[str]] = list(useful[1:]) + [stop_at]
+    return list(zip(useful, stops))
+
+
+def _list_sharded(prefix: str, start_after: Optional[str], stop_at: Optional[str],
+                  depth: int = 0) -> List[Dict[str, Any]]:
+    """
+    Lists a key range in key order: its first page alone, then, if more remain, the rest
+    split into ranges listed concurrently. Ranges can split once more (depth 1, smaller
+    fan-out), so a range that turns out to hold most of the folder is still parallelised.
+    """
+    objs, token = _list_page(prefix, start_after, stop_at)
+    if not token or not objs:
+        return objs
+
+    ranges: List[Tuple[str, Optional[str]]] = []
+    if LIST_PARALLEL_SHARDS > 1 and depth <= 1:
+        shards = LIST_PARALLEL_SHARDS if depth == 0 else max(2, LIST_PARALLEL_SHARDS // 2)
+        probes = LIST_SHARD_PROBES if depth == 0 else max(2, LIST_SHARD_PROBES // 2)
+        ranges = _shard_ranges(prefix, [o["Key"] for o in objs], stop_at, shards, probes)
+
+    if not ranges:
+        return objs + _list_range(prefix, objs[-1]["Key"], stop_at, token)
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        parts = list(pool.map(lambda r: _list_sharded(prefix, r[0], r[1], depth + 1), ranges))
+    for part in parts:
+        objs.extend(part)
+    return objs
 
 
-def _is_allowed_zip_key(key: str) -> bool:
-    lk = key.lower()
-    return any(lk.endswith(ext) for ext in ALLOWED_ZIP_EXT)
+def _list_objects(prefix: str) -> List[Dict[str, Any]]:
+    """
+    Lists every object under prefix in key order. The first page is fetched alone;
+    if it is truncated, the remaining keyspace is sharded and listed concurrently.
+    """
+    return _list_sharded(prefix, None, None)
+
+
+def _capture_sort_key(meta: Dict[str, Any], key: str) -> Tuple[int, str, str]:
+    # Images without an EXIF capture time go last, in key order
+    taken = (meta.get(key) or {}).get("taken")
+    return (0, taken, key) if taken else (1, "", key)
 
 
-def _list_folder_for_prefix(prefix: str) -> Tuple[List[str], Optional[str]]:
+def _list_folder_for_prefix(prefix: str, sort: str = "key") -> Tuple[List[str], List[str], Optional[str], Dict[str, Any]]:
+    """
+    Returns (image_keys, video_keys, newest_zip_key, image_meta) for a gallery prefix.
+    sort="captured" orders images by EXIF capture time from the folder index (no object is opened).
+    """
     image_keys: List[str] = []
+    video_keys: List[str] = []
     zip_best_key: Optional[str] = None
     zip_best_last_modified = None
 
-    token: Optional[str] = None
-    while True:
-        args: Dict[str, Any] = {"Bucket": GALLERY_BUCKET, "Prefix": prefix, "MaxKeys": 1000}
-        if token:
-            args["ContinuationToken"] = token
+    for obj in _list_objects(prefix):
+        k = obj.get("Key", "")
+        kind = media_types.classify(k, MEDIA_EXT_TABLE)
 
-        resp = _s3.list_objects_v2(**args)
+        if kind == media_types.IMAGE:
+            image_keys.append(k)
+        elif kind == media_types.VIDEO:
+            video_keys.append(k)
+        elif kind == media_types.ZIP:
+            lm = obj.get("LastModified")
+            if zip_best_last_modified is None or (lm and lm > zip_best_last_modified):
+                zip_best_last_modified = lm
+                zip_best_key = k
 
-        for obj in resp.get("Contents", []):
-            k = obj.get("Key", "")
-            if not k or k.endswith("/"):
-                continue
+    index: Dict[str, Any] = {}
+    if image_keys:
+        index = _load_folder_index(prefix[len(BASE_PREFIX):])
 
-            if _is_allowed_image_key(k):
-                image_keys.append(k)
+    # Sort before truncating so the first MAX_LIST_KEYS are the earliest shots, not the first keys
+    if sort == "captured":
+        image_keys.sort(key=lambda k: _capture_sort_key(index, k))
 
-            if _is_allowed_zip_key(k):
-                lm = obj.get("LastModified")
-                if zip_best_last_modified is None or (lm and lm > zip_best_last_modified):
-                    zip_best_last_modified = lm
-                    zip_best_key = k
+    if len(image_keys) > MAX_LIST_KEYS:
+        image_keys = image_keys[:MAX_LIST_KEYS]
+    if len(video_keys) > MAX_LIST_KEYS:
+        video_keys = video_keys[:MAX_LIST_KEYS]
+
+    meta: Dict[str, Any] = {k: index[k] for k in image_keys if k in index}
+
+    return image_keys, video_keys, zip_best_key, meta
 
-        if not resp.get("IsTruncated"):
+
+# =============================================================================
+# Helpers: admin multipart upload
+# =============================================================================
+def _normalize_upload_filename(name: str) -> str:
+    s = (name or "").strip()
+    if not s:
+        raise ValueError("filename_required")
+    if "/" in s or ".." in s or not re.fullmatch(r"[A-Za-z0-9._ ()-]+", s):
+        raise ValueError("invalid_filename")
+    if media_types.classify(s, MEDIA_EXT_TABLE) == media_types.OTHER:
+        raise ValueError("unsupported_file_type")
+    return s
+
+
+def _upload_str(req: _Request, field: str, default: str = "") -> str:
+    # Body fields are client JSON: a wrong type is a 400, not an AttributeError (500)
+    v = req.body.get(field)
+    if v is None:
+        return default
+    if not isinstance(v, str):
+        raise ValueError(f"invalid_{field}")
+    return v.strip()
+
+
+def _upload_int(v: Any, error: str) -> int:
+    if isinstance(v, bool):
+        raise ValueError(error)
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        raise ValueError(error) from None
+
+
+def _upload_part_number(v: Any) -> int:
+    n = _upload_int(v, "invalid_part_number")
+    if n < 1 or n > S3_MAX_PARTS:
+        raise ValueError("invalid_part_number")
+    return n
+
+
+def _upload_parts_from_request(req: _Request) -> List[Dict[str, Any]]:
+    parts_in = req.body.get("parts") or []
+    if not isinstance(parts_in, list) or not parts_in:
+        raise ValueError("parts_required")
+
+    parts = []
+    for p in parts_in:
+        if not isinstance(p, dict):
+            raise ValueError("invalid_part")
+        etag = p.get("etag")
+        if not isinstance(etag, str) or not etag.strip():
+            raise ValueError("part_etag_required")
+        parts.append({"PartNumber": _upload_part_number(p.get("part_number")), "ETag": etag.strip()})
+    parts.sort(key=lambda p: p["PartNumber"])
+    return parts
+
+
+def _upload_key_from_request(req: _Request) -> str:
+    # The key is always rebuilt from folder + filename; a client-supplied key is never trusted
+    folder = _parse_folder_from_admin_request(req)
+    return BASE_PREFIX + folder + _normalize_upload_filename(_upload_str(req, "filename"))
+
+
+def _upload_part_size(size: int) -> int:
+    mib = 1024 * 1024
+    part = max(5, UPLOAD_PART_MIB) * mib
+    # Grow parts to stay within UPLOAD_MAX_PARTS; past 5 GiB parts use up to S3's 10000 instead
+    for max_parts in (min(UPLOAD_MAX_PARTS, S3_MAX_PARTS), S3_MAX_PARTS):
+        if size <= part * max_parts:
             break
-        token = resp.get("NextContinuationToken")
+        grown = -(-size // max_parts)
+        grown = -(-grown // mib) * mib  # round up to whole MiB
+        if grown <= S3_MAX_PART_BYTES:
+            part = grown
+            break
+    # S3 rejects the upload (at "complete", after every byte was sent) outside these
+    if part > S3_MAX_PART_BYTES or -(-size // part) > S3_MAX_PARTS:
+        raise ValueError("size_too_large")
+    return part
 
-    if len(image_keys) > MAX_LIST_KEYS:
-        image_keys = image_keys[:MAX_LIST_KEYS]
 
-    return image_keys, zip_best_key
+def _upload_id_from_request(req: _Request) -> str:
+    upload_id = _upload_str(req, "upload_id")
+    if not upload_id:
+        raise ValueError("upload_id_required")
+    return upload_id
+
+
+def _handle_admin_upload(req: _Request) -> Dict[str, Any]:
+    """
+    POST /admin/upload {"action": "start"|"parts"|"complete"|"abort", "folder", "filename", ...}
+    """
+    action = _upload_str(req, "action")
+    key = _upload_key_from_request(req)
+
+    if action == "start":
+        size = _upload_int(req.body.get("size") or 0, "invalid_size")
+        if size <= 0:
+            raise ValueError("size_required")
+        if size > S3_MAX_OBJECT_BYTES:
+            raise ValueError("size_too_large")
+        part_size = _upload_part_size(size)
+        content_type = _upload_str(req, "content_type") or "application/octet-stream"
+        if len(content_type) > 255 or not re.fullmatch(r"[\w.+-]+/[\w.+-]+(\s*;.*)?", content_type):
+            raise ValueError("invalid_content_type")
+
+        resp = _s3.create_multipart_upload(Bucket=GALLERY_BUCKET, Key=key, ContentType=content_type)
+        return _response_json(200, {
+            "key": key,
+            "upload_id": resp["UploadId"],
+            "part_size": part_size,
+            "part_count": max(1, -(-size // part_size)),
+        })
+
+    upload_id = _upload_id_from_request(req)
+
+    if action == "parts":
+        numbers = req.body.get("part_numbers") or []
+        if not isinstance(numbers, list) or not numbers:
+            raise ValueError("part_numbers_required")
+        if len(numbers) > UPLOAD_PRESIGN_BATCH:
+            raise ValueError("too_many_part_numbers")
+
+        urls: Dict[str, str] = {}
+        for n in numbers:
+            n = _upload_part_number(n)
+            # Presigning is local (no S3 call), so a batch costs microseconds per URL
+            urls[str(n)] = _s3_presign.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": GALLERY_BUCKET, "Key": key, "UploadId": upload_id, "PartNumber": n},
+                ExpiresIn=UPLOAD_URL_TTL_SECONDS,
+            )
+        return _response_json(200, {"key": key, "urls": urls, "expires_in": UPLOAD_URL_TTL_SECONDS})
+
+    if action == "complete":
+        parts = _upload_parts_from_request(req)
+        # Fires s3:ObjectCreated:CompleteMultipartUpload -> thumb queue, same as any other upload
+        try:
+            _s3.complete_multipart_upload(
+                Bucket=GALLERY_BUCKET, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+            )
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code", "")
+            if code in ("NoSuchUpload", "InvalidPart", "InvalidPartOrder", "EntityTooSmall"):
+                return _response_json(400, {"error": code})
+            raise
+        return _response_json(200, {"ok": True, "key": key, "parts": len(parts)})
+
+    if action == "abort":
+        try:
+            _s3.abort_multipart_upload(Bucket=GALLERY_BUCKET, Key=key, UploadId=upload_id)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code", "") != "NoSuchUpload":
+                raise
+        return _response_json(200, {"ok": True, "key": key, "aborted": upload_id})
+
+    raise ValueError("invalid_action")
+
+
+# =============================================================================
+# Helpers: thumbnail coverage (merge-join gallery/<folder> vs thumbs/<folder>)
+# =============================================================================
+def _split_stem(rel: str) -> Tuple[str, str]:
+    # "album/IMG_1.jpg" -> ("album", "IMG_1"), same stem rule as the thumb Lambda's thumb_key_for
+    rel_dir, base = posixpath.split(rel)
+    return rel_dir, base.replace(posixpath.splitext(base)[1], "")
+
+
+def _coverage_sources(objs: List[Dict[str, Any]]) -> List[Tuple[Tuple[str, str], Dict[str, Any]]]:
+    out = []
+    for obj in objs:
+        k = obj.get("Key", "")
+        if media_types.classify(k, MEDIA_EXT_TABLE) not in (media_types.IMAGE, media_types.VIDEO):
+            continue
+        out.append((_split_stem(k[len(BASE_PREFIX):]), obj))
+    out.sort(key=lambda t: t[0])
+    return out
+
+
+def _coverage_thumbs(objs: List[Dict[str, Any]]) -> List[Tuple[Tuple[str, str], Dict[str, Any]]]:
+    # Only thumb-of-* renditions; folder markers, _index.json and other renditions are ignored
+    out = []
+    for obj in objs:
+        k = obj.get("Key", "")
+        rel_dir, base = posixpath.split(k[len(THUMBS_PREFIX):])
+        if not base.startswith(THUMB_FILE_PREFIX):
+            continue
+        out.append(((rel_dir, posixpath.splitext(base[len(THUMB_FILE_PREFIX):])[0]), obj))
+    out.sort(key=lambda t: t[0])
+    return out
+
+
+def _coverage_report(folder: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Diffs originals against thumbs by stem with one merge-join over both sorted lists.
+    Returns {"missing", "stale", "skipped_small", "orphaned", "ok"} lists of objects.
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        src_f = pool.submit(_list_objects, BASE_PREFIX + folder)
+        thumb_f = pool.submit(_list_objects, THUMBS_PREFIX + folder)
+        sources = _coverage_sources(src_f.result())
+        thumbs = _coverage_thumbs(thumb_f.result())
+
+    min_bytes = int(THUMB_DECIDER_MIN_MIB * 1024 * 1024) if THUMB_DECIDER_MIN_MIB > 0 else 0
+    report: Dict[str, List[Dict[str, Any]]] = {"missing": [], "stale": [], "skipped_small": [], "orphaned": [], "ok": []}
+
+    i = j = 0
+    while i < len(sources) or j < len(thumbs):
+        if j >= len(thumbs) or (i < len(sources) and sources[i][0] < thumbs[j][0]):
+            obj = sources[i][1]
+            size = int(obj.get("Size", 0) or 0)
+            if min_bytes and size < min_bytes:
+                report["skipped_small"].append(obj)
+            else:
+                report["missing"].append(obj)
+            i += 1
+            continue
+
+        if i >= len(sources) or thumbs[j][0] < sources[i][0]:
+            report["orphaned"].append(thumbs[j][1])
+            j += 1
+            continue
+
+        # Same stem on both sides (several originals or thumb formats may share one)
+        stem = sources[i][0]
+        newest_thumb = None
+        while j < len(thumbs) and thumbs[j][0] == stem:
+            lm = thumbs[j][1].get("LastModified")
+            if newest_thumb is None or (lm and lm > newest_thumb):
+                newest_thumb = lm
+            j += 1
+        while i < len(sources) and sources[i][0] == stem:
+            obj = sources[i][1]
+            lm = obj.get("LastModified")
+            report["stale" if (lm and newest_thumb and lm > newest_thumb) else "ok"].append(obj)
+            i += 1
+
+    return report
+
+
+def _enqueue_thumb_jobs(objs: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Sends S3-shaped ObjectCreated records to the thumb queue (10 per SendMessageBatch).
+    Returns (sent, failed).
+    """
+    entries = []
+    for n, obj in enumerate(objs):
+        record = {
+            "eventSource": "aws:s3",
+            "eventName": "ObjectCreated:CoverageFill",
+            "s3": {
+                "bucket": {"name": GALLERY_BUCKET},
+                # S3 notifications URL-encode keys; the thumb Lambda unquote_plus()es them
+                "object": {"key": quote_plus(obj["Key"], safe="/"), "size": int(obj.get("Size", 0) or 0)},
+            },
+        }
+        entries.append({"Id": str(n), "MessageBody": json.dumps({"Records": [record]})})
+
+    batches = [entries[k:k + 10] for k in range(0, len(entries), 10)]
+
+    def send(batch: List[Dict[str, Any]]) -> int:
+        resp = _sqs.send_message_batch(QueueUrl=THUMB_QUEUE_URL, Entries=batch)
+        return len(resp.get("Failed", []))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(LIST_PARALLEL_SHARDS, len(batches)))) as pool:
+        failed = sum(pool.map(send, batches))
+    return len(entries) - failed, failed
+
+
+def _handle_admin_coverage(req: _Request, enqueue: bool) -> Dict[str, Any]:
+    folder = _parse_folder_from_admin_request(req)
+    report = _coverage_report(folder)
+
+    out: Dict[str, Any] = {
+        "folder": folder,
+        "counts": {k: len(v) for k, v in report.items()},
+    }
+    for k in ("missing", "stale", "skipped_small", "orphaned"):
+        out[k] = [o["Key"] for o in report[k][:COVERAGE_MAX_ITEMS]]
+
+    if enqueue:
+        if not THUMB_QUEUE_URL:
+            raise ValueError("thumb_queue_not_configured")
+        gaps = (report["missing"] + report["stale"])[:COVERAGE_MAX_ENQUEUE]
+        sent, failed = _enqueue_thumb_jobs(gaps)
+        out["enqueued"] = sent
+        out["enqueue_failed"] = failed
+        print(json.dumps({"COVERAGE_ENQUEUE": folder, "sent": sent, "failed": failed}))
+
+    return _response_json(200, out)
 
 
 # =============================================================================
@@ -408,11 +946,13 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     wants_redirect = path.endswith(OPEN_PATH)
 
     try:
+        req = _Request(event)
+
         # ---------------------------------------------------------------------
         # ADMIN: GET /admin/links
         # ---------------------------------------------------------------------
         if method == "GET" and path.endswith(ADMIN_LINKS_PATH):
-            q = event.get("queryStringParameters") or {}
+            q = req.query
             limit = 200
             if "limit" in q:
                 try:
@@ -469,8 +1009,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # ADMIN: POST /sign
         # ---------------------------------------------------------------------
         if method == "POST" and path.endswith(SIGN_PATH):
-            folder = _parse_folder_from_admin_request(event)
-            link_ttl_seconds = _parse_link_ttl_seconds_from_admin_request(event)
+            folder = _parse_folder_from_admin_request(req)
+            link_ttl_seconds = _parse_link_ttl_seconds_from_admin_request(req)
 
             now = int(time.time())
             link_exp = now + int(link_ttl_seconds)
@@ -498,13 +1038,26 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # ADMIN: POST /revoke
         # ---------------------------------------------------------------------
         if method == "POST" and path.endswith(REVOKE_PATH):
-            token = _parse_token(event)
+            token = _parse_token(req)
             if not token:
                 return _response_json(400, {"error": "missing_token"})
 
             _table.delete_item(Key={"link_token": token})
             return _response_json(200, {"ok": True, "revoked": token})
 
+        # ---------------------------------------------------------------------
+        # ADMIN: POST /admin/upload  (multipart upload of originals)
+        # ---------------------------------------------------------------------
+        if method == "POST" and path.endswith(ADMIN_UPLOAD_PATH):
+            return _handle_admin_upload(req)
+
+        # ---------------------------------------------------------------------
+        # ADMIN: GET /admin/coverage (report) | POST /admin/coverage (report + enqueue gaps)
+        # ---------------------------------------------------------------------
+        if method in ("GET", "POST") and path.endswith(ADMIN_COVERAGE_PATH):
+            enqueue = method == "POST" and str(req.body.get("enqueue", "")).lower() in ("1", "true")
+            return _handle_admin_coverage(req, enqueue)
+
         # ---------------------------------------------------------------------
         # PUBLIC: methods
         # ---------------------------------------------------------------------
@@ -517,7 +1070,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # PUBLIC: GET /open?t=...
         # ---------------------------------------------------------------------
         if path.endswith(OPEN_PATH):
-            token = _parse_token(event)
+            token = _parse_token(req)
             if not token:
                 return _redirect_error(400, "missing_token")
 
@@ -547,12 +1100,12 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
             # ✅ policy covers BOTH gallery + thumbs, and URL-encodes spaces
             policy_str = _build_custom_policy_for_folder(folder, expires_epoch)
-            policy_b64, sig_b64 = _sign_policy(policy_str)
+            policy_b64, sig_b64, key_pair_id = _sign_policy(policy_str)
 
             cookies = {
                 "CloudFront-Policy": policy_b64,
                 "CloudFront-Signature": sig_b64,
-                "CloudFront-Key-Pair-Id": CLOUDFRONT_KEY_PAIR_ID,
+                "CloudFront-Key-Pair-Id": key_pair_id,
             }
 
             # Put folder into query param (encoded). URLSearchParams will decode it back.
@@ -567,16 +1120,18 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # PUBLIC: GET/HEAD /list?folder=...&t=...
         # ---------------------------------------------------------------------
         if method in ("GET", "HEAD") and path.endswith(LIST_PATH):
-            q = event.get("queryStringParameters") or {}
-            folder_in = q.get("folder")
+            folder_in = req.query.get("folder")
             if folder_in is None:
-                payload = _parse_json_body(event)
-                folder_in = payload.get("folder") or payload.get("path")
+                folder_in = req.body.get("folder") or req.body.get("path")
+
+            sort = (req.query.get("sort") or "key").strip().lower()
+            if sort not in LIST_SORTS:
+                return _response_json(400, {"error": "invalid_sort"})
 
             if folder_in is None:
                 return _response_json(400, {"error": "folder_required"})
 
-            token = _parse_token(event)
+            token = _parse_token(req)
             if not token:
                 return _response_json(403, {"error": "missing_token"})
 
@@ -596,7 +1151,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 return _response_json(403, {"error": "folder_not_allowed"})
 
             prefix = BASE_PREFIX + req_folder  # may contain spaces; S3 supports it
-            files, zip_key = _list_folder_for_prefix(prefix)
+            files, videos, zip_key, meta = _list_folder_for_prefix(prefix, sort)
 
             if method == "HEAD":
                 return {
@@ -607,7 +1162,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     "body": "",
                 }
 
-            out: Dict[str, Any] = {"folder": prefix, "files": files}
+            out: Dict[str, Any] = {"folder": prefix, "sort": sort, "files": files, "videos": videos, "meta": meta}
             if zip_key:
                 out["zip"] = zip_key
 
@@ -619,6 +1174,11 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         return _response_json(404, {"error": "not_found"})
 
+    except RequestTooLarge as rt:
+        if wants_redirect:
+            return _redirect_error(413, str(rt))
+        return _response_json(413, {"error": str(rt)})
+
     except ValueError as ve:
         if wants_redirect:
             return _redirect_error(400, str(ve))
@@ -0,0 +1,51 @@
+from typing import Dict, Iterable, Set
+
+
+# =============================================================================
+# Shared media classification (packaged into both lambda.zip and lambda-thumb.zip)
+# =============================================================================
+# Every listed/evented key is classified ONCE with a single dict lookup on its
+# extension, instead of lowercasing it and looping endswith() over each ext set.
+
+IMAGE = "image"
+VIDEO = "video"
+ZIP = "zip"
+OTHER = "other"
+
+DEFAULT_IMAGE_EXTS = ".jpg,.jpeg,.png,.webp,.gif"
+DEFAULT_VIDEO_EXTS = ".mp4,.mov,.webm,.m4v"
+DEFAULT_ZIP_EXTS = ".zip"
+
+
+def parse_exts(raw: str) -> Set[str]:
+    # ".jpg, JPEG,png" -> {".jpg", ".jpeg", ".png"}
+    out = set()
+    for e in (raw or "").split(","):
+        e = e.strip().lower()
+        if not e:
+            continue
+        out.add(e if e.startswith(".") else "." + e)
+    return out
+
+
+def build_ext_table(image_exts: Iterable[str], video_exts: Iterable[str], zip_exts: Iterable[str]) -> Dict[str, str]:
+    # Later kinds win on overlap (a misconfigured ".zip" image ext still lists as zip)
+    table: Dict[str, str] = {}
+    for kind, exts in ((IMAGE, image_exts), (VIDEO, video_exts), (ZIP, zip_exts)):
+        for e in exts:
+            table[e.lower()] = kind
+    return table
+
+
+def ext_of(key: str) -> str:
+    # Extension of the last path segment, lowercased, with the dot ("" if none)
+    i = key.rfind(".")
+    if i < 0 or key.find("/", i) >= 0:
+        return ""
+    return key[i:].lower()
+
+
+def classify(key: str, table: Dict[str, str]) -> str:
+    if not key or key.endswith("/"):
+        return OTHER
+    return table.get(ext_of(key), OTHER)
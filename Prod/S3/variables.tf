@@ -51,3 +51,9 @@ variable "thumbs_policy_prefix" {
   
 }
 
+variable "admin_origin" {
+    type  = string
+    description = "Admin site origin allowed to upload parts directly to the gallery bucket (\"\" = no CORS)"
+    default = ""
+  
+}
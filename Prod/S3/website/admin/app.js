@@ -7,6 +7,12 @@ const CONFIG = {
   SIGNER_API_URL: "https://cay91jt8o0.execute-api.eu-south-1.amazonaws.com/prod/sign",
   REVOKE_API_URL: "https://cay91jt8o0.execute-api.eu-south-1.amazonaws.com/prod/revoke",
   ADMIN_LIST_URL: "https://cay91jt8o0.execute-api.eu-south-1.amazonaws.com/prod/admin/links",
+  UPLOAD_API_URL: "https://cay91jt8o0.execute-api.eu-south-1.amazonaws.com/prod/admin/upload",
+  COVERAGE_API_URL: "https://cay91jt8o0.execute-api.eu-south-1.amazonaws.com/prod/admin/coverage",
+
+  // Multipart upload: parts in flight at once, part URLs requested per API call
+  UPLOAD_CONCURRENCY: 6,
+  UPLOAD_URL_BATCH: 50,
 
   // Must match your gallery domain
   GALLERY_OPEN_BASE: "https://gallery.project-practice.com/open?t=",
@@ -41,6 +47,12 @@ const resultBox = el("result");
 const folderInput = el("folder");
 const daysInput = el("days");
 
+const btnUpload = el("btnUpload");
+const uploadFilesInput = el("uploadFiles");
+const uploadStatus = el("uploadStatus");
+const btnCoverage = el("btnCoverage");
+const btnFillGaps = el("btnFillGaps");
+
 const linksStatus = el("linksStatus");
 const foldersRoot = el("folders");
 
@@ -79,6 +91,13 @@ function hideLinksStatus() {
   linksStatus.textContent = "";
 }
 
+function showUploadStatus(msg, type = "ok") {
+  uploadStatus.style.display = "block";
+  uploadStatus.classList.remove("ok", "err");
+  uploadStatus.classList.add(type);
+  uploadStatus.textContent = msg;
+}
+
 function clearFoldersUI() {
   foldersRoot.innerHTML = "";
 }
@@ -103,6 +122,9 @@ function updateAuthUI() {
   authStatus.textContent = ok ? "Logged in" : "Not logged in";
   btnLogout.disabled = !ok;
   btnLoadLinks.disabled = !ok;
+  btnUpload.disabled = !ok;
+  btnCoverage.disabled = !ok;
+  btnFillGaps.disabled = !ok;
 }
 
 btnCopy.addEventListener("click", async () => {
@@ -480,6 +502,194 @@ async function revokeToken(token, rowEl, btnEl) {
   }
 }
 
+// --------------------
+// Upload originals (multipart, parts PUT straight to S3)
+// --------------------
+async function uploadApi(jwt, body) {
+  const resp = await fetch(CONFIG.UPLOAD_API_URL, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "Authorization": `Bearer ${jwt}`,
+    },
+    body: JSON.stringify(body),
+  });
+
+  const text = await resp.text();
+  let payload;
+  try { payload = JSON.parse(text); } catch { payload = { raw: text }; }
+
+  if (!resp.ok) {
+    const err = new Error(payload.error || payload.detail || "request_failed");
+    err.status = resp.status;
+    throw err;
+  }
+  return payload;
+}
+
+async function uploadFile(jwt, folder, file, onProgress) {
+  const ids = { folder, filename: file.name };
+  const start = await uploadApi(jwt, {
+    ...ids,
+    action: "start",
+    size: file.size,
+    content_type: file.type || "application/octet-stream",
+  });
+  const upload = { ...ids, upload_id: start.upload_id };
+  const partSize = start.part_size;
+  const partCount = start.part_count;
+
+  const batches = {}; // batch index -> Promise<{partNumber: url}>, shared by all workers
+  const etags = [];
+  let next = 1;
+  let uploadedBytes = 0;
+
+  async function urlFor(n) {
+    const b = Math.floor((n - 1) / CONFIG.UPLOAD_URL_BATCH);
+    if (!batches[b]) {
+      const first = b * CONFIG.UPLOAD_URL_BATCH + 1;
+      const last = Math.min(partCount, first + CONFIG.UPLOAD_URL_BATCH - 1);
+      const part_numbers = [];
+      for (let i = first; i <= last; i++) part_numbers.push(i);
+      batches[b] = uploadApi(jwt, { ...upload, action: "parts", part_numbers }).then((r) => r.urls);
+    }
+    return (await batches[b])[n];
+  }
+
+  async function worker() {
+    while (next <= partCount) {
+      const n = next++;
+      const blob = file.slice((n - 1) * partSize, Math.min(file.size, n * partSize));
+      const resp = await fetch(await urlFor(n), { method: "PUT", body: blob });
+      if (!resp.ok) throw new Error(`part_${n}_failed_${resp.status}`);
+      etags.push({ part_number: n, etag: resp.headers.get("ETag") });
+      uploadedBytes += blob.size;
+      onProgress(uploadedBytes);
+    }
+  }
+
+  try {
+    const workers = [];
+    for (let i = 0; i < Math.min(CONFIG.UPLOAD_CONCURRENCY, partCount); i++) workers.push(worker());
+    await Promise.all(workers);
+    // Completing fires the same ObjectCreated event the thumbnail pipeline already handles
+    return await uploadApi(jwt, { ...upload, action: "complete", parts: etags });
+  } catch (e) {
+    try { await uploadApi(jwt, { ...upload, action: "abort" }); } catch { /* lifecycle rule cleans up */ }
+    throw e;
+  }
+}
+
+btnUpload.addEventListener("click", async () => {
+  const jwt = getAccessTokenOrNull();
+  if (!jwt) {
+    await startLogin();
+    return;
+  }
+
+  const folderPrefix = normalizeFolderPrefix(folderInput.value);
+  const files = Array.from(uploadFilesInput.files || []);
+  if (!folderPrefix) {
+    showUploadStatus("Folder is required (e.g., client123 or client123/job456).", "err");
+    return;
+  }
+  if (!files.length) {
+    showUploadStatus("Choose one or more files first.", "err");
+    return;
+  }
+
+  btnUpload.disabled = true;
+  let done = 0;
+
+  try {
+    for (const file of files) {
+      await uploadFile(jwt, folderPrefix, file, (bytes) => {
+        const pct = file.size ? Math.floor((bytes / file.size) * 100) : 100;
+        showUploadStatus(`Uploading ${file.name} (${done + 1}/${files.length}) ${pct}%`, "ok");
+      });
+      done++;
+    }
+    showUploadStatus(`Uploaded ${done} file(s) to ${folderPrefix}`, "ok");
+  } catch (e) {
+    if (e.status === 401 || e.status === 403) {
+      sessionStorage.removeItem(STORAGE.accessToken);
+      sessionStorage.removeItem(STORAGE.expiresAt);
+      updateAuthUI();
+      showUploadStatus("Session expired. Please login again.", "err");
+      return;
+    }
+    showUploadStatus(`Upload failed after ${done} file(s): ${e.message || "request_failed"}`, "err");
+  } finally {
+    btnUpload.disabled = !isLoggedIn();
+  }
+});
+
+// --------------------
+// Thumbnail coverage (missing / stale / orphaned thumbs for the folder)
+// --------------------
+async function runCoverage(enqueue) {
+  const jwt = getAccessTokenOrNull();
+  if (!jwt) {
+    await startLogin();
+    return;
+  }
+
+  const folderPrefix = normalizeFolderPrefix(folderInput.value);
+  if (!folderPrefix) {
+    showUploadStatus("Folder is required (e.g., client123 or client123/job456).", "err");
+    return;
+  }
+
+  btnCoverage.disabled = true;
+  btnFillGaps.disabled = true;
+  showUploadStatus(enqueue ? "Queueing missing thumbnails…" : "Checking thumbnails…", "ok");
+
+  try {
+    const url = enqueue
+      ? CONFIG.COVERAGE_API_URL
+      : `${CONFIG.COVERAGE_API_URL}?folder=${encodeURIComponent(folderPrefix)}`;
+    const resp = await fetch(url, {
+      method: enqueue ? "POST" : "GET",
+      headers: {
+        "Content-Type": "application/json",
+        "Authorization": `Bearer ${jwt}`,
+      },
+      body: enqueue ? JSON.stringify({ folder: folderPrefix, enqueue: true }) : undefined,
+      cache: "no-store",
+    });
+
+    const text = await resp.text();
+    let payload;
+    try { payload = JSON.parse(text); } catch { payload = { raw: text }; }
+
+    if (!resp.ok) {
+      if (resp.status === 401 || resp.status === 403) {
+        sessionStorage.removeItem(STORAGE.accessToken);
+        sessionStorage.removeItem(STORAGE.expiresAt);
+        updateAuthUI();
+        showUploadStatus("Session expired. Please login again.", "err");
+        return;
+      }
+      showUploadStatus(`Coverage failed (${resp.status}): ${payload.error || payload.detail || "request_failed"}`, "err");
+      return;
+    }
+
+    const c = payload.counts || {};
+    let msg = `${folderPrefix}: ${c.ok || 0} ok, ${c.missing || 0} missing, ${c.stale || 0} stale, `
+      + `${c.skipped_small || 0} small (no thumb by design), ${c.orphaned || 0} orphaned`;
+    if (enqueue) msg += ` — queued ${payload.enqueued || 0}`;
+    showUploadStatus(msg, (c.missing || c.stale) && !enqueue ? "err" : "ok");
+  } catch {
+    showUploadStatus("Network/config error while checking thumbnails.", "err");
+  } finally {
+    btnCoverage.disabled = !isLoggedIn();
+    btnFillGaps.disabled = !isLoggedIn();
+  }
+}
+
+btnCoverage.addEventListener("click", () => runCoverage(false));
+btnFillGaps.addEventListener("click", () => runCoverage(true));
+
 // --------------------
 // Generate link
 // --------------------
@@ -0,0 +1,53 @@
+############################################
+# Thumbnail Queue (S3 events -> SQS -> thumb Lambda)
+############################################
+resource "aws_sqs_queue" "thumb_dlq" {
+  name                      = "${var.thumb_queue_name}-dlq"
+  message_retention_seconds = 1209600 # 14 days
+
+  tags = var.tags
+}
+
+resource "aws_sqs_queue" "thumb" {
+  name = var.thumb_queue_name
+
+  # Must be >= the thumb Lambda timeout (AWS recommends 6x) or messages reappear mid-batch
+  visibility_timeout_seconds = var.visibility_timeout_seconds
+  message_retention_seconds  = 345600 # 4 days
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.thumb_dlq.arn
+    maxReceiveCount     = var.max_receive_count
+  })
+
+  tags = var.tags
+}
+
+############################################
+# Allow the gallery bucket to send events
+############################################
+data "aws_iam_policy_document" "thumb_queue" {
+  statement {
+    sid     = "AllowGalleryBucketEvents"
+    effect  = "Allow"
+    actions = ["sqs:SendMessage"]
+
+    principals {
+      type        = "Service"
+      identifiers = ["s3.amazonaws.com"]
+    }
+
+    resources = [aws_sqs_queue.thumb.arn]
+
+    condition {
+      test     = "ArnEquals"
+      variable = "aws:SourceArn"
+      values   = [var.gallery_bucket_arn]
+    }
+  }
+}
+
+resource "aws_sqs_queue_policy" "thumb" {
+  queue_url = aws_sqs_queue.thumb.id
+  policy    = data.aws_iam_policy_document.thumb_queue.json
+}
@@ -0,0 +1,19 @@
+output "thumb_queue_arn" {
+    value = aws_sqs_queue.thumb.arn
+
+}
+
+output "thumb_queue_url" {
+    value = aws_sqs_queue.thumb.id
+
+}
+
+output "thumb_dlq_arn" {
+    value = aws_sqs_queue.thumb_dlq.arn
+
+}
+
+output "thumb_queue_max_receive_count" {
+    value = var.max_receive_count
+
+}
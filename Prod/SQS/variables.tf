@@ -0,0 +1,31 @@
+variable "gallery_bucket_arn" {
+    type = string
+    description = "Gallery Bucket ARN (allowed to send S3 events)"
+
+}
+
+variable "thumb_queue_name" {
+    type = string
+    default = "thumb-events"
+
+}
+
+variable "visibility_timeout_seconds" {
+    type = number
+    description = "Should be >= 6x the thumb Lambda timeout"
+    default = 360
+
+}
+
+variable "max_receive_count" {
+    type = number
+    description = "Deliveries before a message is moved to the DLQ"
+    default = 5
+
+}
+
+variable "tags" {
+  type        = map(string)
+  description = "Tags to apply to resources"
+  default     = {}
+}
@@ -54,7 +54,7 @@ module "s3" {
     }
 
     gallery_retention_days = local.gallery_retention_days
-
+    admin_origin           = local.admin_full_link2
 
 }
 
@@ -80,6 +80,10 @@ module "lambda" {
     dynamodb_table_arn = module.dynamodb.dynamodb_table_arn
     dynamodb_table_name = module.dynamodb.dynamodb_table_name
 
+    thumb_queue_arn = module.sqs.thumb_queue_arn
+    thumb_queue_url = module.sqs.thumb_queue_url
+    thumb_queue_max_receive_count = module.sqs.thumb_queue_max_receive_count
+
   
 
 
@@ -191,11 +195,25 @@ module "s3_events" {
     }
 
     gallery_bucket_name = module.s3.gallery_bucket_name
-    lambda_thumb_arn    = module.lambda.lambda_thumb_arn
+    thumb_queue_arn     = module.sqs.thumb_queue_arn
+
+    # queue policy must exist before S3 validates the notification target
+    depends_on = [module.sqs]
   
 }
 
 
+module "sqs" {
+  source = "./SQS"
+  providers = {
+      aws = aws.eu-south-1
+    }
+
+    gallery_bucket_arn = module.s3.gallery_bucket_arn
+
+}
+
+
 
 
 module "dynamodb" {